@@ -0,0 +1,278 @@
+import os
+import pickle
+import sqlite3
+import stat
+import threading
+import time
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.exceptions import ImproperlyConfigured
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache_entries ('
+    'key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL, '
+    'accessed REAL NOT NULL, size INTEGER NOT NULL) WITHOUT ROWID',
+    'CREATE INDEX IF NOT EXISTS cache_lru ON cache_entries (accessed)',
+    'CREATE TABLE IF NOT EXISTS cache_usage ('
+    'id INTEGER PRIMARY KEY CHECK (id = 0), '
+    'bytes INTEGER NOT NULL, entries INTEGER NOT NULL)',
+    'INSERT OR IGNORE INTO cache_usage VALUES (0, 0, 0)',
+    'CREATE TRIGGER IF NOT EXISTS cache_usage_insert '
+    'AFTER INSERT ON cache_entries BEGIN UPDATE cache_usage '
+    'SET bytes = bytes + NEW.size, entries = entries + 1; END',
+    'CREATE TRIGGER IF NOT EXISTS cache_usage_delete '
+    'AFTER DELETE ON cache_entries BEGIN UPDATE cache_usage '
+    'SET bytes = bytes - OLD.size, entries = entries - 1; END',
+    'CREATE TRIGGER IF NOT EXISTS cache_usage_update '
+    'AFTER UPDATE OF size ON cache_entries BEGIN UPDATE cache_usage '
+    'SET bytes = bytes + NEW.size - OLD.size; END',
+)
+UPSERT = (
+    'INSERT INTO cache_entries (key, value, expires, accessed, size) '
+    'VALUES (?, ?, ?, ?, ?) ON CONFLICT (key) DO UPDATE SET '
+    'value = excluded.value, expires = excluded.expires, '
+    'accessed = excluded.accessed, size = excluded.size'
+)
+ALIVE = '(expires IS NULL OR expires > ?)'
+# Ниже лимита параметров запроса в старых сборках SQLite (999).
+MAX_QUERY_KEYS = 500
+
+
+class SharedCache(BaseCache):
+    """Кэш в файле SQLite, общий для всех процессов на одной машине.
+
+    LOCATION — путь к файлу; на /dev/shm он лежит в разделяемой памяти,
+    а mmap_size отображает его в адресное пространство процессов.
+    Значения — pickle, поэтому каталог и файл должны принадлежать
+    пользователю процесса, а каталог — быть закрыт для остальных (0700).
+    Записи вытесняются по давности последнего чтения (LRU), когда
+    объём значений превышает OPTIONS['MAX_BYTES'] или их число —
+    OPTIONS['MAX_ENTRIES']. incr, add и вытеснение выполняются
+    в транзакции BEGIN IMMEDIATE, поэтому атомарны между процессами.
+    """
+
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+    # Время последнего чтения обновляется не чаще раза в секунду,
+    # чтобы горячие ключи не превращали каждое чтение в запись.
+    access_resolution = 1.0
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._location = location
+        self._max_bytes = int(options.get('MAX_BYTES', 64 * 1024 * 1024))
+        self._mmap_size = int(options.get('MMAP_SIZE', self._max_bytes * 2))
+        self._busy_timeout = float(options.get('BUSY_TIMEOUT', 5))
+        self._local = threading.local()
+
+    def _connection(self):
+        db = getattr(self._local, 'db', None)
+        if db is not None and self._local.pid == os.getpid():
+            return db
+        self._check_location()
+        db = sqlite3.connect(
+            self._location, timeout=self._busy_timeout,
+            isolation_level=None, check_same_thread=False
+        )
+        db.execute('PRAGMA journal_mode = WAL')
+        db.execute('PRAGMA synchronous = OFF')
+        db.execute(f'PRAGMA mmap_size = {self._mmap_size}')
+        with self._transaction(db):
+            for statement in SCHEMA:
+                db.execute(statement)
+        self._local.db, self._local.pid = db, os.getpid()
+        return db
+
+    def _check_location(self):
+        """Создать каталог 0700 и отказаться от чужого каталога или файла.
+
+        Иначе другой пользователь мог бы подложить свой файл кэша,
+        а pickle.loads выполнил бы из него произвольный код.
+        """
+        directory = os.path.dirname(os.path.abspath(self._location))
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        for path, kind in ((directory, stat.S_ISDIR),
+                           (self._location, stat.S_ISREG)):
+            try:
+                info = os.lstat(path)
+            except FileNotFoundError:
+                continue
+            if not kind(info.st_mode) or info.st_uid != os.getuid():
+                raise ImproperlyConfigured(
+                    f'{path} не принадлежит пользователю процесса'
+                )
+            if path == directory and info.st_mode & 0o077:
+                raise ImproperlyConfigured(
+                    f'Каталог кэша {directory} доступен другим '
+                    f'пользователям: нужны права 0700'
+                )
+
+    @staticmethod
+    @contextmanager
+    def _transaction(db):
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            yield db
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        db.execute('COMMIT')
+
+    def _write(self):
+        return self._transaction(self._connection())
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _dumps(self, value):
+        return pickle.dumps(value, self.pickle_protocol)
+
+    def _store(self, db, key, value, timeout, now):
+        data = self._dumps(value)
+        if len(data) > self._max_bytes:
+            db.execute('DELETE FROM cache_entries WHERE key = ?', (key,))
+            return False
+        db.execute(UPSERT, (
+            key, data, self.get_backend_timeout(timeout), now, len(data)
+        ))
+        return True
+
+    def _cull(self, db, now):
+        size, entries = db.execute(
+            'SELECT bytes, entries FROM cache_usage'
+        ).fetchone()
+        if size <= self._max_bytes and entries <= self._max_entries:
+            return
+        db.execute(
+            'DELETE FROM cache_entries WHERE expires <= ?', (now,)
+        )
+        while True:
+            size, entries = db.execute(
+                'SELECT bytes, entries FROM cache_usage'
+            ).fetchone()
+            if size <= self._max_bytes and entries <= self._max_entries:
+                return
+            db.execute(
+                'DELETE FROM cache_entries WHERE key IN ('
+                'SELECT key FROM cache_entries ORDER BY accessed LIMIT ?)',
+                (max(1, entries // self._cull_frequency),)
+            )
+
+    def _touch_access(self, db, keys, now):
+        if keys:
+            db.executemany(
+                'UPDATE cache_entries SET accessed = ? WHERE key = ?',
+                [(now, key) for key in keys]
+            )
+
+    def get(self, key, default=None, version=None):
+        key = self._key(key, version)
+        return self._get_many([key]).get(key, default)
+
+    def get_many(self, keys, version=None):
+        names = {self._key(key, version): key for key in keys}
+        return {
+            names[key]: value
+            for key, value in self._get_many(list(names)).items()
+        }
+
+    def _get_many(self, keys):
+        db = self._connection()
+        now = time.time()
+        rows = []
+        for start in range(0, len(keys), MAX_QUERY_KEYS):
+            chunk = keys[start:start + MAX_QUERY_KEYS]
+            placeholders = ', '.join('?' * len(chunk))
+            rows += db.execute(
+                f'SELECT key, value, accessed FROM cache_entries '
+                f'WHERE key IN ({placeholders}) AND {ALIVE}',
+                (*chunk, now)
+            ).fetchall()
+        self._touch_access(db, [
+            key for key, _, accessed in rows
+            if now - accessed > self.access_resolution
+        ], now)
+        return {key: pickle.loads(value) for key, value, _ in rows}
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        with self._write() as db:
+            if self._store(db, key, value, timeout, now):
+                self._cull(db, now)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        now = time.time()
+        with self._write() as db:
+            for key, value in data.items():
+                self._store(db, self._key(key, version), value, timeout, now)
+            self._cull(db, now)
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        with self._write() as db:
+            exists = db.execute(
+                f'SELECT 1 FROM cache_entries WHERE key = ? AND {ALIVE}',
+                (key, now)
+            ).fetchone()
+            if exists:
+                return False
+            stored = self._store(db, key, value, timeout, now)
+            if stored:
+                self._cull(db, now)
+            return stored
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        with self._write() as db:
+            row = db.execute(
+                f'SELECT value FROM cache_entries WHERE key = ? AND {ALIVE}',
+                (key, time.time())
+            ).fetchone()
+            if row is None:
+                raise ValueError("Key '%s' not found" % key)
+            value = pickle.loads(row[0]) + delta
+            data = self._dumps(value)
+            db.execute(
+                'UPDATE cache_entries SET value = ?, size = ? WHERE key = ?',
+                (data, len(data), key)
+            )
+        return value
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        with self._write() as db:
+            return db.execute(
+                f'UPDATE cache_entries SET expires = ? '
+                f'WHERE key = ? AND {ALIVE}',
+                (self.get_backend_timeout(timeout), key, now)
+            ).rowcount > 0
+
+    def has_key(self, key, version=None):
+        key = self._key(key, version)
+        return self._connection().execute(
+            f'SELECT 1 FROM cache_entries WHERE key = ? AND {ALIVE}',
+            (key, time.time())
+        ).fetchone() is not None
+
+    def delete(self, key, version=None):
+        key = self._key(key, version)
+        with self._write() as db:
+            db.execute('DELETE FROM cache_entries WHERE key = ?', (key,))
+
+    def delete_many(self, keys, version=None):
+        with self._write() as db:
+            db.executemany(
+                'DELETE FROM cache_entries WHERE key = ?',
+                [(self._key(key, version),) for key in keys]
+            )
+
+    def clear(self):
+        with self._write() as db:
+            db.execute('DELETE FROM cache_entries')
@@ -0,0 +1,86 @@
+import os
+
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """SQLite с настройками для нескольких процессов-воркеров.
+
+    Каждое новое подключение получает PRAGMA из INIT_PRAGMAS, которые
+    можно переопределить в OPTIONS['pragmas']: WAL позволяет читать
+    во время записи, busy_timeout ждёт блокировку вместо ошибки.
+    OPTIONS['transaction_mode'] = 'IMMEDIATE' берёт блокировку записи
+    в начале транзакции: отложенная транзакция, которая сначала читает,
+    а потом пишет, при конфликте падает с «database is locked» сразу,
+    не дожидаясь busy_timeout.
+
+    При CONN_HEALTH_CHECKS постоянное подключение перед первым запросом
+    в каждом HTTP-запросе проверяется и переоткрывается, если файл базы
+    был заменён или подключение перестало отвечать.
+    """
+
+    INIT_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': 5000,
+        'mmap_size': 256 * 1024 * 1024,
+        'cache_size': -64 * 1024,
+        'temp_store': 'MEMORY',
+    }
+
+    health_check_done = False
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        self.pragmas = dict(self.INIT_PRAGMAS, **params.pop('pragmas', {}))
+        self.transaction_mode = params.pop('transaction_mode', None)
+        if 'timeout' in params:
+            self.pragmas['busy_timeout'] = int(params['timeout'] * 1000)
+        return params
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        if not self.is_in_memory_db():
+            for name, value in self.pragmas.items():
+                conn.execute(f'PRAGMA {name} = {value}')
+        self.file_id = self._file_id()
+        self.health_check_done = True
+        return conn
+
+    def _file_id(self):
+        try:
+            stat = os.stat(self.settings_dict['NAME'])
+        except (OSError, TypeError, ValueError):
+            return None
+        return stat.st_dev, stat.st_ino
+
+    def _start_transaction_under_autocommit(self):
+        if self.transaction_mode:
+            self.cursor().execute(f'BEGIN {self.transaction_mode}')
+        else:
+            super()._start_transaction_under_autocommit()
+
+    def is_usable(self):
+        if not self.is_in_memory_db() and self._file_id() != self.file_id:
+            return False
+        try:
+            self.connection.execute('SELECT 1')
+        except base.Database.Error:
+            return False
+        return True
+
+    def ensure_connection(self):
+        if (
+            self.connection is not None
+            and self.settings_dict.get('CONN_HEALTH_CHECKS')
+            and not self.health_check_done
+            and not self.in_atomic_block
+        ):
+            if not self.is_usable():
+                self.close()
+            self.health_check_done = True
+        super().ensure_connection()
+
+    def close_if_unusable_or_obsolete(self):
+        super().close_if_unusable_or_obsolete()
+        self.health_check_done = False
@@ -0,0 +1,141 @@
+import json
+import logging
+import random
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from . import routers
+
+logger = logging.getLogger('yatube.sql')
+
+PLACEHOLDER_LIST = re.compile(r'\(\s*%s(?:\s*,\s*%s)*\s*\)')
+SHAPE_LENGTH = 300
+
+
+def query_shape(sql):
+    """Форма запроса: списки параметров IN (...) любой длины совпадают."""
+    return PLACEHOLDER_LIST.sub('(%s...)', sql)
+
+
+class QueryRecorder:
+    """Обёртка execute_wrapper: считает запросы, время и формы SQL."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+            self.shapes[query_shape(sql)] += 1
+
+    def repeated(self, threshold):
+        return [
+            (shape, count) for shape, count in self.shapes.most_common()
+            if count >= threshold
+        ]
+
+
+class QueryInspectMiddleware:
+    """Статистика SQL на запрос для выборки SQL_INSPECT_SAMPLE_RATE.
+
+    Пишет заголовок Server-Timing и JSON-строку в лог yatube.sql;
+    повторы одной формы запроса от SQL_INSPECT_REPEAT_THRESHOLD раз
+    считаются признаком N+1 и пишутся в лог как предупреждение.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if random.random() >= settings.SQL_INSPECT_SAMPLE_RATE:
+            return self.get_response(request)
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+        total = time.perf_counter() - started
+        repeated = recorder.repeated(settings.SQL_INSPECT_REPEAT_THRESHOLD)
+        self.add_server_timing(response, recorder, total, repeated)
+        self.log(request, response, recorder, total, repeated)
+        return response
+
+    @staticmethod
+    def add_server_timing(response, recorder, total, repeated):
+        metrics = [
+            f'db;dur={recorder.duration * 1000:.1f};'
+            f'desc="{recorder.count} queries"',
+            f'app;dur={total * 1000:.1f}',
+        ]
+        if repeated:
+            metrics.append(f'nplusone;desc="{len(repeated)} repeated"')
+        if response.has_header('Server-Timing'):
+            metrics.insert(0, response['Server-Timing'])
+        response['Server-Timing'] = ', '.join(metrics)
+
+    @staticmethod
+    def log(request, response, recorder, total, repeated):
+        match = request.resolver_match
+        record = {
+            'view': match.view_name if match else None,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'queries': recorder.count,
+            'db_ms': round(recorder.duration * 1000, 2),
+            'total_ms': round(total * 1000, 2),
+            'repeated': [
+                {'sql': shape[:SHAPE_LENGTH], 'count': count}
+                for shape, count in repeated
+            ],
+        }
+        level = logging.WARNING if repeated else logging.INFO
+        logger.log(level, json.dumps(record, ensure_ascii=False))
+
+
+class ReplicaStickinessMiddleware:
+    """Чтение из основной базы после записи.
+
+    Запрос, который пишет в базу, и следующие запросы того же клиента
+    в течение REPLICA_STICKY_SECONDS читают из default. Окно хранится
+    в подписанной cookie: автор сразу видит свой пост или комментарий,
+    даже если реплика ещё не догнала основную базу. Вне запроса
+    (фоновые потоки, команды) реплики не используются.
+    """
+
+    cookie_name = 'primary_pin'
+    safe_methods = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        routers.reset()
+        routers.enable_replicas()
+        window = settings.REPLICA_STICKY_SECONDS
+        pinned = request.get_signed_cookie(
+            self.cookie_name, default=None, max_age=window
+        )
+        if pinned or request.method not in self.safe_methods:
+            routers.pin_primary()
+        try:
+            response = self.get_response(request)
+            if routers.has_written():
+                response.set_signed_cookie(
+                    self.cookie_name, '1', max_age=window, httponly=True
+                )
+            return response
+        finally:
+            routers.reset()
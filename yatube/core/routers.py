@@ -0,0 +1,70 @@
+import random
+import threading
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+_state = threading.local()
+
+
+def pin_primary():
+    """Читать из основной базы до конца текущего запроса."""
+    _state.pinned = True
+
+
+def is_pinned():
+    return getattr(_state, 'pinned', False)
+
+
+def has_written():
+    return getattr(_state, 'wrote', False)
+
+
+def enable_replicas():
+    """Разрешить чтение из реплик до конца текущего запроса."""
+    _state.replicas = True
+
+
+def read_replica():
+    """Было ли в текущем запросе чтение из реплики."""
+    return getattr(_state, 'replica_read', False)
+
+
+def reset():
+    _state.pinned = _state.wrote = False
+    _state.replicas = _state.replica_read = False
+
+
+class PrimaryReplicaRouter:
+    """Запись — в default, чтение — в одну из DATABASE_REPLICAS.
+
+    В реплики идёт только чтение моделей приложений
+    DATABASE_REPLICA_APPS внутри запроса (см. ReplicaStickinessMiddleware):
+    сессии и пользователи, фоновые потоки превью и команды читают
+    из default. После первой записи в запросе, внутри транзакции и для
+    закреплённых за основной базой запросов чтение тоже идёт в default,
+    чтобы пользователь видел свои изменения.
+    """
+
+    def db_for_read(self, model, **hints):
+        replicas = settings.DATABASE_REPLICAS
+        if (
+            not replicas or not getattr(_state, 'replicas', False)
+            or is_pinned()
+            or model._meta.app_label not in settings.DATABASE_REPLICA_APPS
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return DEFAULT_DB_ALIAS
+        _state.replica_read = True
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        _state.wrote = _state.pinned = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        return {obj1._state.db, obj2._state.db} <= databases or None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
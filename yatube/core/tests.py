@@ -1,6 +1,27 @@
-from django.test import TestCase
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.http import HttpResponse
+from django.test import (
+    RequestFactory, SimpleTestCase, TestCase, override_settings
+)
 from django.shortcuts import render
 
+from .cache import SharedCache
+from .db.sqlite3.base import DatabaseWrapper
+from . import routers
+from .middleware import ReplicaStickinessMiddleware, query_shape
+
 
 class ViewTestClass(TestCase):
     def test_page_not_found(self):
@@ -8,3 +29,217 @@ class ViewTestClass(TestCase):
         response = self.client.get('/nonexist-page/')
         self.assertTemplateUsed(response, 'core/404.html')
         self.assertEqual(response.status_code, 404)
+
+
+@override_settings(SQL_INSPECT_SAMPLE_RATE=1.0)
+class QueryInspectMiddlewareTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_server_timing_header(self):
+        """Проверка заголовка Server-Timing со статистикой SQL."""
+        with self.assertLogs('yatube.sql', 'INFO') as logs:
+            response = self.client.get('/')
+        self.assertIn('db;dur=', response['Server-Timing'])
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['view'], 'posts:index')
+        self.assertGreater(record['queries'], 0)
+
+    @override_settings(SQL_INSPECT_REPEAT_THRESHOLD=1)
+    def test_repeated_queries_flagged(self):
+        """Проверка: повторяющиеся формы запросов пишутся как N+1."""
+        with self.assertLogs('yatube.sql', 'WARNING') as logs:
+            response = self.client.get('/')
+        self.assertIn('nplusone', response['Server-Timing'])
+        self.assertTrue(json.loads(logs.records[0].getMessage())['repeated'])
+
+    @override_settings(SQL_INSPECT_SAMPLE_RATE=0)
+    def test_sampling(self):
+        """Проверка: запросы вне выборки не замеряются."""
+        response = self.client.get('/')
+        self.assertFalse(response.has_header('Server-Timing'))
+
+    def test_query_shape(self):
+        """Проверка: IN-списки разной длины дают одну форму запроса."""
+        self.assertEqual(
+            query_shape('SELECT 1 WHERE id IN (%s, %s)'),
+            query_shape('SELECT 1 WHERE id IN (%s)')
+        )
+
+
+def increment_shared(location, times):
+    backend = SharedCache(location, {})
+    for _ in range(times):
+        backend.incr('counter')
+
+
+class SharedCacheTest(TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.location = os.path.join(directory, 'cache.sqlite3')
+        self.cache = SharedCache(self.location, {})
+
+    def test_basic_operations(self):
+        """Проверка get/set/add/get_many/delete общего кэша."""
+        self.cache.set('a', {'x': 1})
+        self.assertEqual(self.cache.get('a'), {'x': 1})
+        self.assertFalse(self.cache.add('a', 2))
+        self.assertTrue(self.cache.add('b', 2))
+        self.cache.set_many({'c': 3, 'd': 4})
+        self.assertEqual(
+            self.cache.get_many(['a', 'b', 'c', 'missing']),
+            {'a': {'x': 1}, 'b': 2, 'c': 3}
+        )
+        self.cache.delete('a')
+        self.assertIsNone(self.cache.get('a'))
+        self.cache.set('e', 5, 0)
+        self.assertFalse(self.cache.has_key('e'))
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_visible_from_another_instance(self):
+        """Проверка: записи видны другому подключению к тому же файлу."""
+        self.cache.set('shared', 'value')
+        self.assertEqual(
+            SharedCache(self.location, {}).get('shared'), 'value'
+        )
+
+    def test_lru_eviction_by_size(self):
+        """Проверка вытеснения давно не читавшихся записей по объёму."""
+        cache = SharedCache(self.location, {
+            'OPTIONS': {'MAX_BYTES': 3000, 'CULL_FREQUENCY': 10}
+        })
+        cache.access_resolution = 0
+        cache.set('old', 'x' * 900)
+        cache.set('hot', 'x' * 900)
+        cache.set('new', 'x' * 900)
+        cache.get('old')
+        cache.set('newest', 'x' * 900)
+        self.assertEqual(
+            set(cache.get_many(['old', 'hot', 'new', 'newest'])),
+            {'old', 'new', 'newest'}
+        )
+
+    def test_atomic_incr_across_processes(self):
+        """Проверка атомарности incr между процессами."""
+        self.cache.set('counter', 0)
+        workers = [
+            multiprocessing.get_context('fork').Process(
+                target=increment_shared, args=(self.location, 50)
+            )
+            for _ in range(4)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(self.cache.get('counter'), 200)
+
+    def test_suite_uses_shared_cache(self):
+        """Проверка: тесты идут на SharedCache во временном каталоге."""
+        self.assertIsInstance(caches['default'], SharedCache)
+        self.assertTrue(os.path.dirname(
+            settings.CACHES['default']['LOCATION']
+        ).startswith(tempfile.gettempdir()))
+
+    def test_refuses_foreign_location(self):
+        """Проверка: открытый другим каталог и чужой файл не читаются."""
+        self.cache.set('a', 1)
+        directory = os.path.dirname(self.location)
+        os.chmod(directory, 0o777)
+        with self.assertRaises(ImproperlyConfigured):
+            SharedCache(self.location, {}).get('a')
+        os.chmod(directory, 0o700)
+        with mock.patch('core.cache.os.getuid',
+                        return_value=os.getuid() + 1):
+            with self.assertRaises(ImproperlyConfigured):
+                SharedCache(self.location, {}).get('a')
+        self.assertEqual(SharedCache(self.location, {}).get('a'), 1)
+
+
+class SQLiteBackendTest(TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.path = os.path.join(directory, 'db.sqlite3')
+        self.wrapper = DatabaseWrapper(dict(
+            connection.settings_dict, NAME=self.path,
+            CONN_HEALTH_CHECKS=True,
+            OPTIONS={'timeout': 3, 'transaction_mode': 'IMMEDIATE'},
+        ))
+        self.addCleanup(self.wrapper.close)
+
+    def pragma(self, name):
+        with self.wrapper.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_init_pragmas(self):
+        """Проверка PRAGMA нового подключения."""
+        self.assertEqual(self.pragma('journal_mode'), 'wal')
+        self.assertEqual(self.pragma('synchronous'), 1)
+        self.assertEqual(self.pragma('busy_timeout'), 3000)
+        self.assertEqual(self.pragma('cache_size'), -64 * 1024)
+
+    def test_health_check_reopens_replaced_file(self):
+        """Проверка: подключение к заменённому файлу переоткрывается."""
+        with self.wrapper.cursor() as cursor:
+            cursor.execute('CREATE TABLE marker (id INTEGER)')
+        self.wrapper.close_if_unusable_or_obsolete()
+        old_connection = self.wrapper.connection
+        os.rename(self.path, self.path + '.old')
+        self.wrapper.close_if_unusable_or_obsolete()
+        with self.wrapper.cursor() as cursor:
+            cursor.execute(
+                "SELECT count(*) FROM sqlite_master WHERE name = 'marker'"
+            )
+            self.assertEqual(cursor.fetchone()[0], 0)
+        self.assertIsNot(self.wrapper.connection, old_connection)
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTest(SimpleTestCase):
+    def setUp(self):
+        self.router = routers.PrimaryReplicaRouter()
+        self.factory = RequestFactory()
+        self.reads = []
+        self.model = apps.get_model('posts', 'Post')
+
+    def view(self, request):
+        self.reads.append(self.router.db_for_read(self.model))
+        if request.GET.get('write'):
+            self.router.db_for_write(self.model)
+            self.reads.append(self.router.db_for_read(self.model))
+        return HttpResponse()
+
+    def request(self, request):
+        return ReplicaStickinessMiddleware(self.view)(request)
+
+    def test_reads_go_to_replica(self):
+        """Проверка: чтение без записи идёт в реплику."""
+        response = self.request(self.factory.get('/'))
+        self.assertEqual(self.reads, ['replica'])
+        self.assertNotIn('primary_pin', response.cookies)
+
+    def test_write_pins_primary(self):
+        """Проверка: после записи чтение идёт в основную базу."""
+        response = self.request(self.factory.get('/', {'write': 1}))
+        self.assertEqual(self.reads, ['replica', 'default'])
+        request = self.factory.get('/')
+        request.COOKIES['primary_pin'] = response.cookies['primary_pin'].value
+        self.request(request)
+        self.assertEqual(self.reads[-1], 'default')
+        self.assertFalse(routers.is_pinned())
+
+    def test_primary_outside_request_and_for_other_apps(self):
+        """Проверка: вне запроса и для сессий и пользователей — default."""
+        self.assertEqual(self.router.db_for_read(self.model), 'default')
+        self.model = get_user_model()
+        self.request(self.factory.get('/'))
+        self.assertEqual(self.reads, ['default'])
+
+    def test_unsafe_method_reads_primary(self):
+        """Проверка: POST читает из основной базы с первого запроса."""
+        self.request(self.factory.post('/'))
+        self.assertEqual(self.reads, ['default'])
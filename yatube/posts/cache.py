@@ -0,0 +1,170 @@
+import math
+import random
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import (
+    get_cache_key, has_vary_header, learn_cache_key
+)
+
+from core import routers
+
+VERSION_KEY = 'posts:version:{}'
+CARD_KEY = 'posts:card:{}:{}:{}'
+LOCK_POLL_INTERVAL = 0.05
+
+
+def get_versions(*scopes):
+    """Текущие версии областей кэша; новая область начинается с 1."""
+    keys = [VERSION_KEY.format(scope) for scope in scopes]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, 1, None)
+            versions[key] = cache.get(key, 1)
+    return [versions[key] for key in keys]
+
+
+def bump(*scopes):
+    """Сделать устаревшими все страницы, закэшированные для областей."""
+    for scope in set(scopes):
+        key = VERSION_KEY.format(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, 1, None)
+
+
+def post_scopes(post):
+    scopes = ['index']
+    if post.author_id:
+        scopes.append(f'profile:{post.author.username}')
+    if post.group_id:
+        scopes.append(f'group:{post.group.slug}')
+    return scopes
+
+
+def card_key(post, variant):
+    return CARD_KEY.format(
+        post.pk, variant, int(post.updated.timestamp() * 1000000)
+    )
+
+
+def render_cards(posts, variant, render):
+    """HTML карточек постов по порядку; всё, что есть, берём одним get_many.
+
+    Ключ включает время изменения поста, поэтому правка поста сама
+    делает его старую карточку ненужной, сбрасывать её не нужно.
+    """
+    keys = [card_key(post, variant) for post in posts]
+    cards = cache.get_many(keys)
+    missing = {
+        key: render(post)
+        for key, post in zip(keys, posts) if key not in cards
+    }
+    if missing:
+        cache.set_many(missing, settings.CARD_CACHE_TIMEOUT)
+        cards.update(missing)
+    return [cards[key] for key in keys]
+
+
+def _cacheable(request, response):
+    # Страница из реплики могла отстать, а запись живёт до следующей
+    # записи в её области: такие страницы не кэшируются.
+    if response.status_code != 200 or response.streaming:
+        return False
+    if routers.read_replica():
+        return False
+    return not (
+        not request.COOKIES and response.cookies
+        and has_vary_header(response, 'Cookie')
+    )
+
+
+def _is_fresh(entry, versions):
+    """Вероятностное досрочное истечение (XFetch).
+
+    Чем дольше пересчитывалась страница и чем ближе срок, тем вероятнее,
+    что запрос сочтёт запись устаревшей раньше времени, поэтому записи
+    обновляются по одной, а не все разом в момент истечения.
+    """
+    if entry['versions'] != versions:
+        return False
+    early = entry['delta'] * settings.FEED_CACHE_BETA * -math.log(
+        1.0 - random.random()
+    )
+    return time.time() + early < entry['expires']
+
+
+def _wait_for_entry(entry_key):
+    deadline = time.monotonic() + settings.FEED_CACHE_LOCK_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(LOCK_POLL_INTERVAL)
+        entry = cache.get(entry_key)
+        if entry is not None:
+            return entry
+    return None
+
+
+def _lookup(entry_key, versions):
+    """Вернуть (ответ из кэша, ключ взятой блокировки).
+
+    Свежая запись отдаётся сразу. Для устаревшей или отсутствующей
+    пробуем взять блокировку: кто взял — пересчитывает, остальные
+    отдают устаревшую копию или ждут, пока её построит победитель.
+    """
+    entry = cache.get(entry_key)
+    if entry is not None and _is_fresh(entry, versions):
+        return entry['response'], None
+    lock_key = f'{entry_key}:lock'
+    if cache.add(lock_key, 1, settings.FEED_CACHE_LOCK_TIMEOUT):
+        return None, lock_key
+    if entry is None:
+        entry = _wait_for_entry(entry_key)
+    return (entry['response'] if entry is not None else None), None
+
+
+def cache_feed_page(timeout, scopes):
+    """Кэшировать GET-ответ страницы ленты с защитой от «набега».
+
+    scopes — функция (request, **kwargs) -> список областей страницы.
+    Запись хранит версии областей на момент рендера; после записи поста,
+    группы или комментария сигналы увеличивают версию, и запись
+    становится устаревшей, но не исчезает, пока её пересчитывает
+    один запрос.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view_func(request, *args, **kwargs)
+            names = scopes(request, **kwargs)
+            versions = get_versions(*names)
+            key_prefix = f'feed:u{request.user.pk or 0}:' + ':'.join(names)
+            entry_key = get_cache_key(request, key_prefix, 'GET', cache)
+            lock_key = None
+            if entry_key is not None:
+                response, lock_key = _lookup(entry_key, versions)
+                if response is not None:
+                    return response
+            started = time.time()
+            try:
+                response = view_func(request, *args, **kwargs)
+                if _cacheable(request, response):
+                    entry_key = learn_cache_key(
+                        request, response, timeout, key_prefix, cache
+                    )
+                    cache.set(entry_key, {
+                        'versions': versions,
+                        'response': response,
+                        'expires': time.time() + timeout,
+                        'delta': time.time() - started,
+                    }, timeout + settings.FEED_CACHE_STALE_TTL)
+            finally:
+                if lock_key is not None:
+                    cache.delete(lock_key)
+            return response
+        return wrapper
+    return decorator
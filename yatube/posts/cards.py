@@ -0,0 +1,100 @@
+from collections import namedtuple
+
+from django.conf import settings
+from django.db.models.query import BaseIterable
+
+from .models import Post
+from .storage import image_storage
+
+# Ровно те колонки, что нужны includes/article.html, ключу кэша
+# карточки (pk, updated) и курсору пагинации (pub_date, pk).
+CARD_FIELDS = (
+    'pk', 'text_html', 'pub_date', 'updated', 'image', 'image_renditions',
+    'image_width', 'image_height', 'author__username', 'author__first_name',
+    'author__last_name', 'group__slug',
+)
+# Те же колонки для .only(): внешние ключи нужны select_related.
+MODEL_FIELDS = ('author', 'group') + CARD_FIELDS[1:]
+
+
+class CardAuthor(namedtuple('CardAuthor', 'username first_name last_name')):
+    __slots__ = ()
+
+    def get_full_name(self):
+        return f'{self.first_name} {self.last_name}'.strip()
+
+
+class CardGroup(namedtuple('CardGroup', 'slug')):
+    __slots__ = ()
+
+
+class CardImage(namedtuple('CardImage', 'name')):
+    __slots__ = ()
+
+    def __bool__(self):
+        return bool(self.name)
+
+    @property
+    def url(self):
+        return image_storage.url(self.name)
+
+
+class PostCard:
+    """Пост для карточки ленты: без экземпляров моделей и лишних колонок."""
+
+    __slots__ = (
+        'pk', 'text_html', 'pub_date', 'updated', 'image', 'image_renditions',
+        'image_width', 'image_height', 'author', 'group',
+    )
+
+    rendition_url = Post.rendition_url
+
+    def __init__(self, pk, text_html, pub_date, updated, image,
+                 image_renditions, image_width, image_height, username,
+                 first_name, last_name, group_slug):
+        self.pk = pk
+        self.text_html = text_html
+        self.pub_date = pub_date
+        self.updated = updated
+        self.image = CardImage(image)
+        self.image_renditions = image_renditions
+        self.image_width = image_width
+        self.image_height = image_height
+        self.author = CardAuthor(username, first_name, last_name)
+        self.group = CardGroup(group_slug) if group_slug else None
+
+    def __repr__(self):
+        return f'<PostCard {self.pk}>'
+
+
+class PostCardIterable(BaseIterable):
+    def __iter__(self):
+        queryset = self.queryset
+        compiler = queryset.query.get_compiler(queryset.db)
+        for row in compiler.results_iter(
+            chunked_fetch=self.chunked_fetch, chunk_size=self.chunk_size
+        ):
+            yield PostCard(*row)
+
+
+def post_cards(queryset):
+    """Запрос постов, отдающий PostCard вместо моделей.
+
+    Остаётся ленивым QuerySet: фильтры, сортировка, срезы и count
+    работают как обычно, поэтому подходит обоим пагинаторам.
+    """
+    queryset = queryset.values_list(*CARD_FIELDS)
+    queryset._iterable_class = PostCardIterable
+    return queryset
+
+
+def feed_posts(queryset):
+    """Посты страницы ленты только с колонками карточки.
+
+    По умолчанию это модели Post с отложенными прочими полями (.only()),
+    их автор и группа тоже загружены не целиком; при FEED_CARD_RECORDS
+    вместо моделей отдаются ещё более лёгкие PostCard.
+    """
+    if settings.FEED_CARD_RECORDS:
+        return post_cards(queryset)
+    return queryset.select_related('author', 'group').only(*MODEL_FIELDS)
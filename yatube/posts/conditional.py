@@ -0,0 +1,81 @@
+import hashlib
+from functools import wraps
+
+from django.db.models import OuterRef, Subquery
+from django.views.decorators.http import condition
+
+from .graph import graph
+from .models import Comment, Group, Post, User
+
+
+def _latest(queryset, field):
+    return Subquery(queryset.order_by(f'-{field}').values(field)[:1])
+
+
+def post_detail_state(request, post_id):
+    return Post.objects.filter(pk=post_id).values_list(
+        'updated', 'comments_count', 'author__profile__posts_count',
+        'group__title', 'group__slug',
+        _latest(Comment.objects.filter(post=OuterRef('pk')), 'pub_date'),
+    ).first()
+
+
+def profile_state(request, username):
+    fields = [
+        'pk', 'first_name', 'last_name', 'profile__posts_count',
+        _latest(Post.objects.filter(author=OuterRef('pk')), 'updated'),
+    ]
+    if request.user.username == username:
+        fields.append('profile__recommendations_updated')
+    state = User.objects.filter(username=username).values_list(
+        *fields
+    ).first()
+    if state is not None and request.user.is_authenticated:
+        state += (graph.is_following(request.user.pk, state[0]),)
+    return state
+
+
+def group_state(request, slug):
+    return Group.objects.filter(slug=slug).values_list(
+        'title', 'description', 'posts_count',
+        _latest(Post.objects.filter(group=OuterRef('pk')), 'updated'),
+    ).first()
+
+
+def _state(request, state_func, kwargs):
+    """Состояние страницы, посчитанное один раз на запрос."""
+    cache = request.__dict__.setdefault('_conditional_state', {})
+    if state_func not in cache:
+        cache[state_func] = state_func(request, **kwargs)
+    return cache[state_func]
+
+
+def conditional_page(state_func):
+    """Условный GET по одному запросу к базе, без рендера страницы.
+
+    state_func(request, **kwargs) возвращает строку с полями, от которых
+    зависит страница (None — объекта нет, проверку пропускаем). ETag —
+    хэш этих полей вместе с пользователем и адресом. Last-Modified не
+    отдаётся: самая поздняя дата среди полей откатывается назад при
+    удалении поста и не меняется при правке имени автора или группы,
+    и If-Modified-Since получал бы неверный 304.
+    """
+    def etag(request, **kwargs):
+        state = _state(request, state_func, kwargs)
+        if state is None:
+            return None
+        source = repr((
+            request.user.pk, request.get_full_path(), state
+        )).encode()
+        return hashlib.md5(source).hexdigest()
+
+    def decorator(view_func):
+        view = condition(etag_func=etag)(view_func)
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view_func(request, *args, **kwargs)
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,86 @@
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+
+def shifted(field, delta):
+    """F-выражение счётчика со сдвигом; ниже нуля не опускается.
+
+    Счётчики — PositiveIntegerField с CHECK (>= 0): после вставок
+    мимо сигналов (bulk_create) счётчик может отстать, и вычитание
+    из нуля иначе уронило бы удаление с IntegrityError.
+    """
+    if delta < 0:
+        return Greatest(F(field) + delta, 0)
+    return F(field) + delta
+
+
+def adjust(model, pk, field, delta):
+    """Атомарно изменить счётчик через F-выражение."""
+    if pk is None:
+        return 0
+    return model.objects.filter(pk=pk).update(**{
+        field: shifted(field, delta)
+    })
+
+
+def adjust_profile(user_id, field, delta):
+    Profile = django_apps.get_model('posts', 'Profile')
+    updated = Profile.objects.filter(user_id=user_id).update(
+        **{field: shifted(field, delta)}
+    )
+    if not updated and delta > 0:
+        Profile.objects.get_or_create(user_id=user_id)
+        updated = Profile.objects.filter(user_id=user_id).update(
+            **{field: shifted(field, delta)}
+        )
+    return updated
+
+
+def _count(model, field, outer='pk'):
+    return Coalesce(Subquery(
+        model.objects.filter(
+            **{field: OuterRef(outer)}
+        ).order_by().values(field).annotate(
+            total=Count('pk')
+        ).values('total')
+    ), 0)
+
+
+def recount(apps=django_apps):
+    """Пересчитать все денормализованные счётчики по исходным таблицам.
+
+    Принимает реестр моделей, чтобы работать и из миграции.
+    """
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    Group = apps.get_model('posts', 'Group')
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    Follow = apps.get_model('posts', 'Follow')
+    Profile = apps.get_model('posts', 'Profile')
+    Profile.objects.bulk_create(
+        [Profile(user_id=user_id) for user_id in User.objects.filter(
+            profile__isnull=True
+        ).values_list('pk', flat=True)]
+    )
+    Group.objects.update(posts_count=_count(Post, 'group'))
+    Post.objects.update(comments_count=_count(Comment, 'post'))
+    Profile.objects.update(
+        posts_count=_count(Post, 'author', 'user_id'),
+        followers_count=_count(Follow, 'author', 'user_id'),
+        following_count=_count(Follow, 'user', 'user_id'),
+    )
+
+
+def recount_images(apps=django_apps):
+    """Пересчитать, сколько постов ссылается на каждый файл картинки."""
+    Post = apps.get_model('posts', 'Post')
+    ImageBlob = apps.get_model('posts', 'ImageBlob')
+    ImageBlob.objects.all().delete()
+    ImageBlob.objects.bulk_create(
+        ImageBlob(name=row['image'], refs=row['total'])
+        for row in Post.objects.exclude(image='').order_by().values(
+            'image'
+        ).annotate(total=Count('pk')).iterator()
+    )
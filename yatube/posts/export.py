@@ -0,0 +1,94 @@
+import csv
+import json
+
+from django.conf import settings
+
+from .models import Comment
+
+FORMATS = {
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+    'csv': 'text/csv; charset=utf-8',
+}
+CSV_FIELDS = (
+    'type', 'id', 'post_id', 'author', 'group', 'pub_date', 'text', 'image'
+)
+
+
+def _post_record(post):
+    return {
+        'type': 'post',
+        'id': post.pk,
+        'post_id': post.pk,
+        'author': post.author.username,
+        'group': post.group.slug if post.group_id else None,
+        'pub_date': post.pub_date.isoformat(),
+        'text': post.text,
+        'image': post.image.name or None,
+    }
+
+
+def _comment_record(comment):
+    return {
+        'type': 'comment',
+        'id': comment.pk,
+        'post_id': comment.post_id,
+        'author': comment.author.username,
+        'group': None,
+        'pub_date': comment.pub_date.isoformat(),
+        'text': comment.text,
+        'image': None,
+    }
+
+
+def iter_records(queryset, batch_size=None):
+    """Записи постов, за каждым — его комментарии.
+
+    Посты читаются пачками по ключу id > последнего, комментарии пачки —
+    одним потоковым запросом .iterator(), так что в памяти никогда
+    не больше одной пачки постов.
+    """
+    batch_size = batch_size or settings.EXPORT_BATCH_SIZE
+    queryset = queryset.select_related('author', 'group').order_by('pk')
+    last_pk = 0
+    while True:
+        posts = list(queryset.filter(pk__gt=last_pk)[:batch_size])
+        if not posts:
+            return
+        last_pk = posts[-1].pk
+        comments = Comment.objects.filter(
+            post_id__in=[post.pk for post in posts]
+        ).select_related('author').order_by('post_id', 'pk').iterator(
+            chunk_size=batch_size
+        )
+        comment = next(comments, None)
+        for post in posts:
+            yield _post_record(post)
+            while comment is not None and comment.post_id == post.pk:
+                yield _comment_record(comment)
+                comment = next(comments, None)
+
+
+class _Echo:
+    """Псевдобуфер для csv.writer: write возвращает строку."""
+
+    def write(self, value):
+        return value
+
+
+def iter_ndjson(records):
+    for record in records:
+        yield json.dumps(record, ensure_ascii=False) + '\n'
+
+
+def iter_csv(records):
+    writer = csv.DictWriter(_Echo(), fieldnames=CSV_FIELDS)
+    yield writer.writerow(dict(zip(CSV_FIELDS, CSV_FIELDS)))
+    for record in records:
+        yield writer.writerow(record)
+
+
+def iter_export(queryset, export_format):
+    records = iter_records(queryset)
+    if export_format == 'csv':
+        return iter_csv(records)
+    return iter_ndjson(records)
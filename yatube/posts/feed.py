@@ -0,0 +1,149 @@
+from itertools import islice
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+
+from .models import FeedEntry, Follow, Post, Profile
+
+
+def is_celebrity(author_id):
+    """Авторы с огромным числом подписчиков читаются при запросе ленты."""
+    return Profile.objects.filter(
+        user_id=author_id,
+        followers_count__gt=settings.FEED_FANOUT_LIMIT
+    ).exists()
+
+
+def _bulk_insert(entries):
+    """Вставлять пачками, не держа в памяти всю раскладку.
+
+    Размер запроса внутри пачки Django ограничивает сам под лимиты БД.
+    """
+    entries = iter(entries)
+    while True:
+        batch = list(islice(entries, settings.FEED_BATCH_SIZE))
+        if not batch:
+            return
+        FeedEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def fanout_post(post):
+    """Разложить новый пост по лентам подписчиков автора."""
+    if is_celebrity(post.author_id):
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True).distinct()
+    _bulk_insert(
+        FeedEntry(user_id=user_id, post_id=post.pk)
+        for user_id in followers.iterator()
+    )
+
+
+def add_author(user_id, author_id):
+    """Добавить в ленту пользователя все посты автора."""
+    if is_celebrity(author_id):
+        return
+    posts = Post.objects.filter(
+        author_id=author_id
+    ).values_list('pk', flat=True)
+    _bulk_insert(
+        FeedEntry(user_id=user_id, post_id=post_id)
+        for post_id in posts.iterator()
+    )
+
+
+def remove_author(user_id, author_id):
+    """Убрать из ленты пользователя все посты автора."""
+    FeedEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id
+    ).delete()
+
+
+def followed_authors(user_id):
+    return set(Follow.objects.filter(
+        user_id=user_id
+    ).values_list('author_id', flat=True))
+
+
+def celebrities(author_ids):
+    return list(Profile.objects.filter(
+        user_id__in=author_ids,
+        followers_count__gt=settings.FEED_FANOUT_LIMIT
+    ).values_list('user_id', flat=True))
+
+
+def rebuild(user_id):
+    """Заполнить ленту пользователя заново по его подпискам."""
+    FeedEntry.objects.filter(user_id=user_id).delete()
+    for author_id in followed_authors(user_id):
+        add_author(user_id, author_id)
+
+
+def rebuild_all():
+    """Заполнить все ленты заново одним INSERT ... SELECT.
+
+    Нужен после массовой загрузки через bulk_create, которая не
+    отправляет сигналы; счётчики подписчиков должны быть пересчитаны.
+    """
+    FeedEntry.objects.all().delete()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {FeedEntry._meta.db_table} (user_id, post_id) '
+            f'SELECT f.user_id, p.id FROM {Follow._meta.db_table} f '
+            f'INNER JOIN {Post._meta.db_table} p '
+            f'ON p.author_id = f.author_id '
+            f'INNER JOIN {Profile._meta.db_table} a '
+            f'ON a.user_id = f.author_id '
+            f'WHERE a.followers_count <= %s',
+            [settings.FEED_FANOUT_LIMIT]
+        )
+        return cursor.rowcount
+
+
+def repair(user_id):
+    """Досоздать недостающие записи ленты и удалить лишние.
+
+    Возвращает пару (добавлено, удалено).
+    """
+    authors = followed_authors(user_id)
+    celebrity_ids = celebrities(authors)
+    materialized = authors.difference(celebrity_ids)
+    expected = set(Post.objects.filter(
+        author_id__in=materialized
+    ).values_list('pk', flat=True))
+    actual = set(FeedEntry.objects.filter(
+        user_id=user_id
+    ).values_list('post_id', flat=True))
+    missing = expected - actual
+    stale = actual - expected
+    _bulk_insert(
+        FeedEntry(user_id=user_id, post_id=post_id) for post_id in missing
+    )
+    if stale:
+        FeedEntry.objects.filter(
+            user_id=user_id, post_id__in=stale
+        ).delete()
+    return len(missing), len(stale)
+
+
+def followed_celebrities(user):
+    return celebrities(Follow.objects.filter(user=user).values('author_id'))
+
+
+def feed_queryset(user, celebrity_ids=None):
+    """Посты ленты подписок: материализованная часть плюс знаменитости.
+
+    Посты знаменитостей не раскладываются при записи и добавляются
+    при чтении по author_id; celebrity_ids — уже найденные
+    followed_celebrities(user).
+    """
+    condition = Q(pk__in=FeedEntry.objects.filter(
+        user=user
+    ).values('post_id'))
+    if celebrity_ids is None:
+        celebrity_ids = followed_celebrities(user)
+    if celebrity_ids:
+        condition |= Q(author_id__in=celebrity_ids)
+    return Post.objects.filter(condition)
@@ -1,6 +1,7 @@
 from django import forms
 
 from .models import Post, Comment
+from .thumbnails import schedule_renditions
 
 
 class PostForm(forms.ModelForm):
@@ -16,6 +17,16 @@ class PostForm(forms.ModelForm):
                 'name': 'group', 'class': 'form-control', 'id': 'id_group'}),
         }
 
+    def save(self, commit=True):
+        image_changed = 'image' in self.changed_data
+        if image_changed:
+            self.instance.image_renditions = ''
+            self.instance.image_width = self.instance.image_height = None
+        post = super().save(commit=commit)
+        if commit and image_changed:
+            schedule_renditions(post)
+        return post
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,172 @@
+import threading
+import uuid
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from .models import Follow
+
+GENERATION_KEY = 'posts:graph'
+TOKEN_KEY = 'posts:graph:{}:{}'
+FOLLOWING = 'following'
+FOLLOWERS = 'followers'
+
+
+def _token():
+    return uuid.uuid4().hex
+
+
+class FollowGraph:
+    """Граф подписок в памяти процесса: отсортированные массивы id.
+
+    Для каждого пользователя хранятся id авторов, на которых он
+    подписан, и id подписчиков — array('q'), по 8 байт на связь;
+    проверка подписки — бисекция, счётчик — длина массива. Массивы
+    загружаются из базы при первом обращении и вытесняются по LRU
+    сверх GRAPH_MAX_USERS. Свежесть сверяется с токенами в общем кэше
+    одним get_many на вызов: сигналы Follow правят массивы этого
+    процесса на месте и выдают новые токены, а другие процессы,
+    увидев чужой токен, перечитывают массив.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {FOLLOWING: OrderedDict(), FOLLOWERS: OrderedDict()}
+
+    def _tokens(self, keys):
+        """Токены (поколение графа, токен связи) для ключей (сторона, id)."""
+        names = [GENERATION_KEY] + [TOKEN_KEY.format(*key) for key in keys]
+        tokens = cache.get_many(names)
+        for name in names:
+            if name not in tokens:
+                cache.add(name, _token(), None)
+                tokens[name] = cache.get(name)
+        generation = tokens[GENERATION_KEY]
+        return {
+            key: (generation, tokens[name])
+            for key, name in zip(keys, names[1:])
+        }
+
+    def _load(self, side, user_ids):
+        """Массивы для user_ids одним запросом к основной базе.
+
+        Массив живёт до смены токена, то есть до следующей подписки:
+        прочитанный из отстающей реплики, он так и остался бы старым.
+        """
+        field, other = (
+            ('user_id', 'author_id') if side == FOLLOWING
+            else ('author_id', 'user_id')
+        )
+        loaded = {user_id: array('q') for user_id in user_ids}
+        rows = Follow.objects.using(DEFAULT_DB_ALIAS).filter(**{
+            f'{field}__in': user_ids
+        }).order_by(field, other).values_list(field, other)
+        for user_id, other_id in rows.iterator():
+            loaded[user_id].append(other_id)
+        return loaded
+
+    def _arrays(self, side, user_ids):
+        """Свежие массивы стороны side для пользователей user_ids."""
+        tokens = self._tokens([(side, user_id) for user_id in user_ids])
+        entries = self._entries[side]
+        result, stale = {}, []
+        with self._lock:
+            for user_id in user_ids:
+                entry = entries.get(user_id)
+                if entry is not None and entry[0] == tokens[side, user_id]:
+                    entries.move_to_end(user_id)
+                    result[user_id] = entry[1]
+                else:
+                    stale.append(user_id)
+        if stale:
+            loaded = self._load(side, stale)
+            with self._lock:
+                for user_id, ids in loaded.items():
+                    entries[user_id] = (tokens[side, user_id], ids)
+                    entries.move_to_end(user_id)
+                while len(entries) > settings.GRAPH_MAX_USERS:
+                    entries.popitem(last=False)
+            result.update(loaded)
+        return result
+
+    def following(self, user_id):
+        """Отсортированные id авторов, на которых подписан пользователь."""
+        return self._arrays(FOLLOWING, [user_id])[user_id]
+
+    def followers(self, author_id):
+        """Отсортированные id подписчиков автора."""
+        return self._arrays(FOLLOWERS, [author_id])[author_id]
+
+    def is_following(self, user_id, author_id):
+        if not user_id:
+            return False
+        ids = self.following(user_id)
+        index = bisect_left(ids, author_id)
+        return index < len(ids) and ids[index] == author_id
+
+    def following_many(self, user_id, author_ids):
+        """Те из author_ids, на кого подписан пользователь."""
+        if not user_id:
+            return set()
+        ids = self.following(user_id)
+        found = set()
+        for author_id in author_ids:
+            index = bisect_left(ids, author_id)
+            if index < len(ids) and ids[index] == author_id:
+                found.add(author_id)
+        return found
+
+    def following_count(self, user_id):
+        return len(self.following(user_id))
+
+    def followers_count(self, author_id):
+        return len(self.followers(author_id))
+
+    def _change(self, user_id, author_id, added):
+        """Поправить массивы процесса и выдать обеим сторонам новые токены.
+
+        На месте правятся только свежие массивы: в устаревшем могло не
+        хватать чужих изменений, его проще перечитать.
+        """
+        keys = [(FOLLOWING, user_id), (FOLLOWERS, author_id)]
+        current = self._tokens(keys)
+        tokens = {}
+        with self._lock:
+            for (side, owner), other in zip(keys, (author_id, user_id)):
+                token = _token()
+                tokens[TOKEN_KEY.format(side, owner)] = token
+                entry = self._entries[side].pop(owner, None)
+                if entry is None or entry[0] != current[side, owner]:
+                    continue
+                ids = entry[1]
+                index = bisect_left(ids, other)
+                present = index < len(ids) and ids[index] == other
+                if added and not present:
+                    ids.insert(index, other)
+                elif not added and present:
+                    del ids[index]
+                self._entries[side][owner] = ((entry[0][0], token), ids)
+        cache.set_many(tokens, None)
+
+    def added(self, user_id, author_id):
+        self._change(user_id, author_id, True)
+        # Повторно после коммита: параллельный процесс мог между
+        # сигналом и коммитом перечитать связи без этой подписки.
+        transaction.on_commit(lambda: self._change(user_id, author_id, True))
+
+    def removed(self, user_id, author_id):
+        self._change(user_id, author_id, False)
+        transaction.on_commit(
+            lambda: self._change(user_id, author_id, False)
+        )
+
+    def invalidate(self):
+        """Устарить массивы во всех процессах, например после импорта."""
+        cache.set(GENERATION_KEY, _token(), None)
+
+
+graph = FollowGraph()
@@ -0,0 +1,288 @@
+import csv
+import json
+import os
+from collections import Counter
+from contextlib import contextmanager
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.files import File
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import cache, counters, feed, search, timeline
+from .graph import graph
+from .rendering import render_text
+from .models import (
+    Comment, Follow, Group, ImportCheckpoint, Post, Profile, User
+)
+
+FORMATS = ('ndjson', 'csv')
+# Ниже лимита параметров запроса в старых сборках SQLite (999).
+MAX_QUERY_KEYS = 500
+
+
+@contextmanager
+def explicit_dates(*fields):
+    """Отключить auto_now/auto_now_add, чтобы записать свои даты."""
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def rebuild(scopes=('index',)):
+    """Пересчитать всё, что bulk_create обошёл мимо сигналов.
+
+    Кроме счётчиков, лент и индекса сбрасываются кэш страниц scopes,
+    буферы ленты подписок, граф подписок и рекомендации.
+    """
+    counters.recount()
+    counters.recount_images()
+    entries = feed.rebuild_all()
+    search.get_backend().reindex()
+    cache.bump(*scopes)
+    timeline.invalidate()
+    graph.invalidate()
+    Profile.objects.update(recommendations_stale=True)
+    return entries
+
+
+def read_records(stream, import_format):
+    """Записи из потока NDJSON или CSV в формате выгрузки posts.export."""
+    if import_format == 'csv':
+        for row in csv.DictReader(stream):
+            yield {key: value or None for key, value in row.items()}
+        return
+    for line in stream:
+        if line.strip():
+            yield json.loads(line)
+
+
+def batches(records, size):
+    """Пачки не меньше size записей; комментарии не отрываются от поста.
+
+    Пачка заканчивается только перед записью, которая не комментарий,
+    поэтому пост и идущие за ним комментарии всегда попадают в одну
+    транзакцию и сопоставление id поста нужно держать лишь для пачки.
+    """
+    batch = []
+    for record in records:
+        if len(batch) >= size and record.get('type') != 'comment':
+            yield batch
+            batch = []
+        batch.append(record)
+    if batch:
+        yield batch
+
+
+def _moment(value):
+    return (parse_datetime(value) if value else None) or timezone.now()
+
+
+class Importer:
+    """Массовая загрузка групп, постов, комментариев и подписок.
+
+    Каждая пачка из IMPORT_BATCH_SIZE записей пишется через bulk_create
+    в одной транзакции вместе с позицией в ImportCheckpoint, так что
+    прерванную загрузку можно продолжить с последней целой пачки.
+    Авторы и группы ищутся по словарям username -> id и slug -> id,
+    которые дополняются одним запросом на пачку; неизвестные создаются.
+    bulk_create не отправляет сигналы, поэтому счётчики, ленты
+    и поисковый индекс пересчитываются целиком в rebuild().
+    """
+
+    def __init__(self, images_dir=None, batch_size=None):
+        self.images_dir = images_dir
+        self.batch_size = batch_size or settings.IMPORT_BATCH_SIZE
+        self.users = {}
+        self.groups = {}
+        self.stats = Counter()
+        self.scopes = {'index'}
+        self.password = make_password(None)
+
+    def run(self, records, checkpoint=None, restart=False):
+        """Загрузить записи; вернуть позицию, до которой дошли."""
+        position = 0
+        if checkpoint is not None:
+            state = ImportCheckpoint.objects.get_or_create(name=checkpoint)[0]
+            position = 0 if restart else state.position
+            self.stats['resumed'] = position
+        for batch in batches(
+            islice(records, position, None), self.batch_size
+        ):
+            with transaction.atomic():
+                self.load(batch)
+                position += len(batch)
+                if checkpoint is not None:
+                    ImportCheckpoint.objects.filter(name=checkpoint).update(
+                        position=position, updated=timezone.now()
+                    )
+        return position
+
+    def load(self, batch):
+        by_type = {'group': [], 'post': [], 'comment': [], 'follow': []}
+        for record in batch:
+            if record.get('type') in by_type:
+                by_type[record['type']].append(record)
+            else:
+                self.stats['skipped'] += 1
+        self.load_groups(by_type['group'], by_type['post'])
+        self.resolve_users(
+            [record['author'] for record in batch if record.get('author')]
+            + [record['user'] for record in by_type['follow']
+               if record.get('user')]
+        )
+        post_ids = self.load_posts(by_type['post'])
+        self.load_comments(by_type['comment'], post_ids)
+        self.load_follows(by_type['follow'])
+
+    def _lookup(self, model, field, values, known):
+        """Дополнить словарь known значениями field -> pk из базы."""
+        missing = list({value for value in values if value not in known})
+        for start in range(0, len(missing), MAX_QUERY_KEYS):
+            known.update(model.objects.filter(**{
+                f'{field}__in': missing[start:start + MAX_QUERY_KEYS]
+            }).values_list(field, 'pk'))
+        return [value for value in missing if value not in known]
+
+    def load_groups(self, groups, posts):
+        slugs = [record['slug'] for record in groups if record.get('slug')]
+        slugs += [record['group'] for record in posts if record.get('group')]
+        missing = set(self._lookup(Group, 'slug', slugs, self.groups))
+        if not missing:
+            return
+        described = {
+            record['slug']: record for record in groups
+            if record.get('slug') in missing
+        }
+        Group.objects.bulk_create([
+            Group(
+                slug=slug,
+                title=(described.get(slug, {}).get('title') or slug)[:200],
+                description=described.get(slug, {}).get('description') or '',
+            )
+            for slug in missing
+        ], ignore_conflicts=True)
+        self._lookup(Group, 'slug', missing, self.groups)
+        self.stats['groups'] += len(missing)
+
+    def resolve_users(self, usernames):
+        missing = self._lookup(User, 'username', usernames, self.users)
+        if not missing:
+            return
+        User.objects.bulk_create([
+            User(username=username, password=self.password)
+            for username in missing
+        ], ignore_conflicts=True)
+        self._lookup(User, 'username', missing, self.users)
+        self.stats['users'] += len(missing)
+
+    def attach_image(self, post, name):
+        if not name or not self.images_dir:
+            post.image.name = name or ''
+            return
+        for path in (
+            os.path.join(self.images_dir, name),
+            os.path.join(self.images_dir, os.path.basename(name)),
+        ):
+            if os.path.isfile(path):
+                with open(path, 'rb') as source:
+                    post.image.save(
+                        os.path.basename(name), File(source), save=False
+                    )
+                self.stats['images'] += 1
+                return
+        self.stats['missing_images'] += 1
+
+    def insert_posts(self, posts):
+        """Сохранить посты и вернуть их pk в том же порядке.
+
+        bulk_create на SQLite не возвращает первичные ключи, поэтому
+        они выбираются по границе, запомненной до вставки; в транзакции
+        пачки других вставок между этими запросами быть не может.
+        """
+        if connection.features.can_return_ids_from_bulk_insert:
+            Post.objects.bulk_create(posts)
+            return [post.pk for post in posts]
+        last = Post.objects.order_by('-pk').values_list(
+            'pk', flat=True
+        ).first() or 0
+        Post.objects.bulk_create(posts)
+        return list(Post.objects.filter(pk__gt=last).order_by(
+            'pk'
+        ).values_list('pk', flat=True))
+
+    def load_posts(self, records):
+        posts, sources = [], []
+        for record in records:
+            author_id = self.users.get(record.get('author'))
+            if author_id is None or not record.get('text'):
+                self.stats['skipped'] += 1
+                continue
+            pub_date = _moment(record.get('pub_date'))
+            post = Post(
+                text=record['text'],
+                **render_text(record['text']),
+                author_id=author_id,
+                group_id=self.groups.get(record.get('group')),
+                pub_date=pub_date,
+                updated=pub_date,
+            )
+            self.attach_image(post, record.get('image'))
+            posts.append(post)
+            sources.append(record.get('id'))
+            self.scopes.add(f'profile:{record["author"]}')
+            if post.group_id:
+                self.scopes.add(f'group:{record["group"]}')
+        if not posts:
+            return {}
+        with explicit_dates(
+            Post._meta.get_field('pub_date'), Post._meta.get_field('updated')
+        ):
+            pks = self.insert_posts(posts)
+        self.stats['posts'] += len(pks)
+        return {
+            str(source): pk for source, pk in zip(sources, pks)
+            if source is not None
+        }
+
+    def load_comments(self, records, post_ids):
+        comments = []
+        for record in records:
+            post_id = post_ids.get(str(record.get('post_id')))
+            author_id = self.users.get(record.get('author'))
+            if post_id is None or author_id is None or not record.get('text'):
+                self.stats['skipped'] += 1
+                continue
+            comments.append(Comment(
+                post_id=post_id,
+                author_id=author_id,
+                text=record['text'],
+                pub_date=_moment(record.get('pub_date')),
+            ))
+        with explicit_dates(Comment._meta.get_field('pub_date')):
+            Comment.objects.bulk_create(comments)
+        self.stats['comments'] += len(comments)
+
+    def load_follows(self, records):
+        follows = []
+        for record in records:
+            user_id = self.users.get(record.get('user'))
+            author_id = self.users.get(record.get('author'))
+            if user_id is None or author_id is None or user_id == author_id:
+                self.stats['skipped'] += 1
+                continue
+            follows.append(Follow(user_id=user_id, author_id=author_id))
+            self.scopes.add(f'profile:{record["author"]}')
+        Follow.objects.bulk_create(follows, ignore_conflicts=True)
+        self.stats['follows'] += len(follows)
+
+    def rebuild(self):
+        return rebuild(self.scopes)
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from posts import feed
+from posts.models import Follow
+
+
+class Command(BaseCommand):
+    help = 'Заполняет материализованные ленты подписок заново.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', type=int, action='append', dest='users',
+            help='id пользователя; по умолчанию все подписчики.'
+        )
+
+    def handle(self, *args, **options):
+        users = options['users'] or Follow.objects.values_list(
+            'user_id', flat=True
+        ).distinct().order_by('user_id')
+        count = 0
+        for user_id in users:
+            feed.rebuild(user_id)
+            count += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Перестроено лент: {count}'
+        ))
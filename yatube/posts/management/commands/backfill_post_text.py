@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from posts.rendering import backfill
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет заранее отрисованный HTML, заголовок и выдержку '
+        'постов, у которых их ещё нет.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Перерисовать текст всех постов.'
+        )
+
+    def handle(self, *args, **options):
+        total = backfill(everything=options['all'])
+        self.stdout.write(self.style.SUCCESS(f'Обработано постов: {total}'))
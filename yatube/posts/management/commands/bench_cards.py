@@ -0,0 +1,75 @@
+import gc
+import statistics
+import sys
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.cards import MODEL_FIELDS, post_cards
+from posts.models import Post
+
+PATHS = {
+    'models': lambda queryset: queryset.select_related('author', 'group'),
+    'only': lambda queryset: queryset.select_related(
+        'author', 'group'
+    ).only(*MODEL_FIELDS),
+    'cards': post_cards,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает память, число объектов и время загрузки страницы '
+        'ленты целыми моделями, через .only() и записями PostCard.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', type=int, nargs='+', default=[10, 20, 50, 100]
+        )
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        if not Post.objects.exists():
+            raise CommandError(
+                'В базе нет постов: запустите generate_fake_data'
+            )
+        self.stdout.write(
+            f'{"size":>5} {"path":<7} {"retained":>10} {"peak":>10} '
+            f'{"blocks":>8} {"per post":>9} {"time":>9}'
+        )
+        for size in options['sizes']:
+            for name, path in PATHS.items():
+                self.report(size, name, *self.measure(
+                    path(Post.objects.all()), size, options['repeat']
+                ))
+
+    @staticmethod
+    def measure(queryset, size, repeat):
+        """Удерживаемая и пиковая память, число блоков и медиана времени.
+
+        Память и блоки меряются на отдельном прогоне: tracemalloc сам
+        замедляет выделения и исказил бы время.
+        """
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            list(queryset[:size])
+            timings.append(time.perf_counter() - started)
+        gc.collect()
+        blocks = sys.getallocatedblocks()
+        tracemalloc.start()
+        page = list(queryset[:size])
+        retained, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        blocks = sys.getallocatedblocks() - blocks
+        del page
+        return retained, peak, blocks, statistics.median(timings)
+
+    def report(self, size, name, retained, peak, blocks, duration):
+        self.stdout.write(
+            f'{size:>5} {name:<7} {retained / 1024:>8.1f}KB '
+            f'{peak / 1024:>8.1f}KB {blocks:>8} '
+            f'{retained / size:>8.0f}B {duration * 1000:>7.2f}ms'
+        )
@@ -0,0 +1,147 @@
+import multiprocessing
+import os
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connections, transaction
+from django.db.models import F
+
+from posts.models import Post, Profile
+
+MODES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'OPTIONS': {},
+        'journal_mode': 'DELETE',
+    },
+    'tuned': {
+        'ENGINE': 'core.db.sqlite3',
+        'OPTIONS': {'timeout': 20, 'transaction_mode': 'IMMEDIATE'},
+        'journal_mode': 'WAL',
+    },
+}
+
+
+def percentile(values, share):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[int(share * (len(values) - 1))]
+
+
+def worker(alias, role, deadline, author_ids, results):
+    """Читать страницу ленты или писать пост до deadline."""
+    timings, errors = [], 0
+    per_page = settings.QUANTITY_POSTS
+    index = os.getpid()
+    while time.time() < deadline:
+        started = time.perf_counter()
+        try:
+            if role == 'reader':
+                Post.objects.using(alias).count()
+                list(Post.objects.using(alias).select_related(
+                    'author', 'group'
+                )[:per_page])
+            else:
+                index += 1
+                author_id = author_ids[index % len(author_ids)]
+                with transaction.atomic(using=alias):
+                    Profile.objects.using(alias).filter(
+                        user_id=author_id
+                    ).values_list('posts_count', flat=True).first()
+                    Post.objects.using(alias).bulk_create([Post(
+                        text='Пост из замера конкурентности',
+                        author_id=author_id,
+                    )])
+                    Profile.objects.using(alias).filter(
+                        user_id=author_id
+                    ).update(posts_count=F('posts_count') + 1)
+        except OperationalError:
+            errors += 1
+            continue
+        timings.append((time.perf_counter() - started) * 1000)
+    connections[alias].close()
+    results.put((role, timings, errors))
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает параллельные чтения и записи в копии базы SQLite '
+        'с настройками по умолчанию и с WAL/busy_timeout/IMMEDIATE.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--writers', type=int, default=2)
+        parser.add_argument('--seconds', type=float, default=5)
+        parser.add_argument(
+            '--mode', choices=list(MODES), action='append', dest='modes'
+        )
+
+    def handle(self, *args, **options):
+        source = connections['default'].settings_dict
+        if source['ENGINE'] not in (
+            MODES['default']['ENGINE'], MODES['tuned']['ENGINE']
+        ):
+            raise CommandError('Замер рассчитан только на SQLite')
+        author_ids = list(Profile.objects.values_list('user_id', flat=True))
+        if not author_ids:
+            raise CommandError('В базе нет пользователей')
+        directory = tempfile.mkdtemp()
+        try:
+            for mode in options['modes'] or list(MODES):
+                self.run(mode, source, directory, author_ids, options)
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def copy_database(self, source, target, journal_mode):
+        with sqlite3.connect(source) as origin, \
+                sqlite3.connect(target) as copy:
+            origin.backup(copy)
+            copy.execute(f'PRAGMA journal_mode = {journal_mode}')
+
+    def run(self, mode, source, directory, author_ids, options):
+        config = MODES[mode]
+        path = os.path.join(directory, f'{mode}.sqlite3')
+        self.copy_database(source['NAME'], path, config['journal_mode'])
+        alias = f'bench_{mode}'
+        connections.databases[alias] = dict(
+            source, NAME=path, ENGINE=config['ENGINE'],
+            OPTIONS=config['OPTIONS'], CONN_MAX_AGE=0
+        )
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        results = context.Queue()
+        deadline = time.time() + options['seconds']
+        roles = (
+            ['reader'] * options['readers'] + ['writer'] * options['writers']
+        )
+        processes = [
+            context.Process(
+                target=worker,
+                args=(alias, role, deadline, author_ids, results)
+            )
+            for role in roles
+        ]
+        for process in processes:
+            process.start()
+        collected = {'reader': ([], 0), 'writer': ([], 0)}
+        for _ in processes:
+            role, timings, errors = results.get()
+            done, failed = collected[role]
+            collected[role] = (done + timings, failed + errors)
+        for process in processes:
+            process.join()
+        for role, (timings, errors) in collected.items():
+            self.stdout.write(
+                f'{mode:<8} {role:<7} '
+                f'ops/s={len(timings) / options["seconds"]:8.1f} '
+                f'p50={statistics.median(timings) if timings else 0:7.2f} ms '
+                f'p95={percentile(timings, 0.95):7.2f} ms '
+                f'locked={errors}'
+            )
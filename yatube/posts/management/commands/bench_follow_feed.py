@@ -0,0 +1,138 @@
+import statistics
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from posts import feed, timeline
+from posts.cards import feed_posts
+from posts.importer import explicit_dates
+from posts.models import Follow, Post, User
+from posts.paginators import CursorPaginator
+from posts.rendering import render_text
+from posts.timeline import TimelinePaginator
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает ленту подписок через JOIN в ORM и слиянием '
+        'кэшированных буферов авторов для разного числа подписок. '
+        'Подписчик и недостающие авторы создаются в откатываемой '
+        'транзакции.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--follows', type=int, nargs='+', default=[10, 1000, 10000]
+        )
+        parser.add_argument('--pages', type=int, default=5)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--posts-per-author', type=int, default=10)
+
+    def handle(self, *args, **options):
+        if not Post.objects.exists():
+            raise CommandError(
+                'В базе нет постов: запустите generate_fake_data'
+            )
+        self.stdout.write(
+            f'{"follows":>7} {"path":<12} {"first":>9} '
+            f'{"next pages":>10} {"queries":>7}'
+        )
+        for follows in options['follows']:
+            with transaction.atomic():
+                user = self.subscriber(follows, options['posts_per_author'])
+                self.compare(user, follows, options)
+                transaction.set_rollback(True)
+        timeline.invalidate()
+
+    def subscriber(self, follows, posts_per_author):
+        """Пользователь с follows подписками на авторов с постами."""
+        authors = list(Post.objects.order_by().values_list(
+            'author_id', flat=True
+        ).distinct()[:follows])
+        if len(authors) < follows:
+            authors += self.create_authors(
+                follows - len(authors), posts_per_author
+            )
+        user = User.objects.create_user(username=f'bench_follower_{follows}')
+        Follow.objects.bulk_create(
+            [Follow(user=user, author_id=author_id) for author_id in authors]
+        )
+        feed.rebuild(user.pk)
+        return user
+
+    def create_authors(self, total, posts_per_author):
+        last = User.objects.order_by('-pk').values_list(
+            'pk', flat=True
+        ).first() or 0
+        User.objects.bulk_create([
+            User(username=f'bench_author_{index}', password='!')
+            for index in range(total)
+        ])
+        authors = list(User.objects.filter(pk__gt=last).values_list(
+            'pk', flat=True
+        ))
+        now = timezone.now()
+        text = 'Пост из замера ленты подписок'
+        posts = [
+            Post(
+                text=text, **render_text(text), author_id=author_id,
+                pub_date=now - timedelta(hours=index * len(authors) + shift),
+                updated=now,
+            )
+            for index in range(posts_per_author)
+            for shift, author_id in enumerate(authors)
+        ]
+        with explicit_dates(
+            Post._meta.get_field('pub_date'), Post._meta.get_field('updated')
+        ):
+            Post.objects.bulk_create(posts)
+        return authors
+
+    def compare(self, user, follows, options):
+        per_page = settings.QUANTITY_POSTS
+        orm = CursorPaginator(feed_posts(feed.feed_queryset(user)), per_page)
+        merge = TimelinePaginator(
+            feed_posts(feed.feed_queryset(user)), per_page, user.pk
+        )
+        paths = [
+            ('orm join', orm, lambda: None),
+            ('merge cold', merge, timeline.invalidate),
+            ('merge warm', merge, lambda: None),
+        ]
+        for name, paginator, prepare in paths:
+            first, rest = [], []
+            for _ in range(options['repeat']):
+                prepare()
+                timings = self.walk(paginator, options['pages'])
+                first.append(timings[0])
+                rest.extend(timings[1:])
+            queries = []
+            with connection.execute_wrapper(
+                lambda execute, sql, *args: queries.append(sql)
+                or execute(sql, *args)
+            ):
+                prepare()
+                paginator.get_page()
+            self.stdout.write(
+                f'{follows:>7} {name:<12} '
+                f'{statistics.median(first) * 1000:>7.2f}ms '
+                f'{statistics.median(rest or [0]) * 1000:>8.2f}ms '
+                f'{len(queries):>7}'
+            )
+
+    @staticmethod
+    def walk(paginator, pages):
+        """Время каждой из pages страниц, идя по курсору вперёд."""
+        timings, cursor = [], None
+        for _ in range(pages):
+            started = time.perf_counter()
+            page = paginator.get_page(cursor)
+            timings.append(time.perf_counter() - started)
+            cursor = page.next_cursor
+            if cursor is None:
+                break
+        return timings
@@ -0,0 +1,169 @@
+import json
+import math
+import os
+import statistics
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from posts import feed
+from posts.models import Comment, Follow, Group, Post, User
+
+
+def last_page(total):
+    return max(1, math.ceil(total / settings.QUANTITY_POSTS))
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет время ответа index, group_posts, profile, post_detail '
+        'и follow_index на первой и глубокой странице и сохраняет '
+        'результаты в JSON для сравнения прогонов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=10)
+        parser.add_argument(
+            '--warm', action='store_true',
+            help='Не очищать кэш перед каждым запросом.'
+        )
+        parser.add_argument(
+            '--output-dir',
+            default=os.path.join(settings.BASE_DIR, 'benchmarks')
+        )
+        parser.add_argument(
+            '--compare', help='Файл прошлого прогона для сравнения.'
+        )
+
+    def handle(self, *args, **options):
+        previous = None
+        if options['compare']:
+            try:
+                with open(options['compare']) as source:
+                    previous = {
+                        (row['view'], row['page']): row
+                        for row in json.load(source)['results']
+                    }
+            except (OSError, ValueError, KeyError) as error:
+                raise CommandError(f'Не удалось прочитать прогон: {error}')
+        targets = self.targets()
+        if not targets:
+            raise CommandError(
+                'В базе нет постов: запустите generate_fake_data'
+            )
+        results = []
+        with override_settings(SQL_INSPECT_SAMPLE_RATE=0):
+            for view, page, client, url in targets:
+                row = self.measure(client, url, options['repeat'],
+                                   options['warm'])
+                row.update(view=view, page=page, url=url)
+                results.append(row)
+                self.report(row, previous)
+        path = self.save(results, options)
+        self.stdout.write(self.style.SUCCESS(f'Результаты: {path}'))
+
+    def targets(self):
+        post = Post.objects.annotate(
+            comments_total=Count('comments')
+        ).order_by('-comments_total').first()
+        if post is None:
+            return []
+        anonymous = Client()
+        targets = [
+            ('index', 1, anonymous, reverse('posts:index')),
+            ('index', 'last', anonymous, reverse('posts:index') + (
+                f'?page={last_page(Post.objects.count())}'
+            )),
+            ('post_detail', 1, anonymous, reverse(
+                'posts:post_detail', args=(post.pk,)
+            )),
+        ]
+        group = Group.objects.order_by('-posts_count').first()
+        if group is not None:
+            url = reverse('posts:group_list', args=(group.slug,))
+            targets += [
+                ('group_posts', 1, anonymous, url),
+                ('group_posts', 'last', anonymous,
+                 url + f'?page={last_page(group.posts.count())}'),
+            ]
+        author = User.objects.order_by('-profile__posts_count').first()
+        url = reverse('posts:profile', args=(author.username,))
+        targets += [
+            ('profile', 1, anonymous, url),
+            ('profile', 'last', anonymous,
+             url + f'?page={last_page(author.posts.count())}'),
+        ]
+        reader = User.objects.order_by('-profile__following_count').first()
+        if Follow.objects.filter(user=reader).exists():
+            client = Client()
+            client.force_login(reader)
+            url = reverse('posts:follow_index')
+            total = feed.feed_queryset(reader).count()
+            targets += [
+                ('follow_index', 1, client, url),
+                ('follow_index', 'last', client,
+                 url + f'?page={last_page(total)}'),
+            ]
+        return targets
+
+    def measure(self, client, url, repeat, warm):
+        timings = []
+        queries = 0
+        for _ in range(repeat):
+            if not warm:
+                cache.clear()
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                response = client.get(url)
+                timings.append((time.perf_counter() - started) * 1000)
+            if response.status_code != 200:
+                raise CommandError(f'{url}: ответ {response.status_code}')
+            queries = len(captured)
+        timings.sort()
+        return {
+            'median_ms': round(statistics.median(timings), 2),
+            'p95_ms': round(timings[int(0.95 * (len(timings) - 1))], 2),
+            'queries': queries,
+        }
+
+    def report(self, row, previous):
+        line = (
+            f'{row["view"]:<14} page={row["page"]!s:<5} '
+            f'median={row["median_ms"]:8.2f} ms '
+            f'p95={row["p95_ms"]:8.2f} ms queries={row["queries"]}'
+        )
+        before = previous and previous.get((row['view'], row['page']))
+        if before:
+            line += f' ({row["median_ms"] / before["median_ms"]:.2f}x)'
+        self.stdout.write(line)
+
+    def save(self, results, options):
+        os.makedirs(options['output_dir'], exist_ok=True)
+        created = timezone.now()
+        path = os.path.join(
+            options['output_dir'],
+            created.strftime('bench-%Y%m%d-%H%M%S.json')
+        )
+        with open(path, 'w') as target:
+            json.dump({
+                'created': created.isoformat(),
+                'database': connection.vendor,
+                'warm': options['warm'],
+                'repeat': options['repeat'],
+                'rows': {
+                    'users': User.objects.count(),
+                    'posts': Post.objects.count(),
+                    'comments': Comment.objects.count(),
+                    'follows': Follow.objects.count(),
+                },
+                'results': results,
+            }, target, ensure_ascii=False, indent=2)
+        return path
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+from posts.thumbnails import process_image
+
+
+class Command(BaseCommand):
+    help = (
+        'Пережимает картинки и строит превью для постов, '
+        'у которых их ещё нет.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Перестроить превью всех постов с картинкой.'
+        )
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='')
+        if not options['all']:
+            posts = posts.filter(image_renditions='')
+        count = 0
+        for post_id in posts.values_list('pk', flat=True).iterator():
+            process_image(post_id)
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f'Обработано постов: {count}'))
@@ -0,0 +1,44 @@
+import re
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from posts.counters import recount_images
+from posts.models import Post
+from posts.storage import delete_blob, image_storage
+
+BLOB_NAME = re.compile(r'^[^/]+/(?:[0-9a-f]{2}/){2}[0-9a-f]{64}(?:\.\w+)?$')
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит картинки постов, загруженные до хранилища по хэшу '
+        'содержимого, в общее хранилище и удаляет одинаковые копии.'
+    )
+
+    def handle(self, *args, **options):
+        names = Post.objects.exclude(image='').order_by().values_list(
+            'image', flat=True
+        ).distinct()
+        legacy = [
+            name for name in names.iterator() if not BLOB_NAME.match(name)
+        ]
+        moved, missing = [], 0
+        for name in legacy:
+            if not image_storage.exists(name):
+                missing += 1
+                continue
+            with image_storage.open(name) as source:
+                blob = image_storage.save(name, source)
+            Post.objects.filter(image=name).update(
+                image=blob, image_renditions='', updated=timezone.now()
+            )
+            moved.append(name)
+        recount_images()
+        for name in moved:
+            delete_blob(name)
+        self.stdout.write(self.style.SUCCESS(
+            f'Перенесено файлов: {len(moved)}, не найдено: {missing}'
+        ))
+        call_command('build_renditions', stdout=self.stdout)
@@ -0,0 +1,90 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from posts import feed
+from posts.models import Comment, Follow, Group, Post, User
+
+
+class Command(BaseCommand):
+    help = (
+        'Показывает планы и время запросов лент с индексами posts '
+        'и без них (индексы удаляются внутри откатываемой транзакции).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def queries(self):
+        post = Post.objects.order_by('?').first()
+        group = Group.objects.order_by('?').first()
+        follow = Follow.objects.order_by('?').first()
+        user = follow.user if follow else User.objects.first()
+        per_page = settings.QUANTITY_POSTS
+        shapes = [
+            ('index', Post.objects.all()[:per_page]),
+        ]
+        if group is not None:
+            shapes.append(
+                ('group_posts', group.posts.all()[:per_page])
+            )
+        if post is not None:
+            shapes.append(
+                ('profile', Post.objects.filter(
+                    author_id=post.author_id)[:per_page])
+            )
+            shapes.append(
+                ('comments', Comment.objects.filter(post=post)[:per_page])
+            )
+        if user is not None:
+            shapes.append(
+                ('follow_index', feed.feed_queryset(user)[:per_page])
+            )
+        if follow is not None:
+            shapes.append(
+                ('follow_exists', Follow.objects.filter(
+                    user_id=follow.user_id, author_id=follow.author_id)[:1])
+            )
+        return shapes
+
+    def measure(self, shapes, repeat):
+        results = {}
+        for name, queryset in shapes:
+            started = time.perf_counter()
+            for _ in range(repeat):
+                list(queryset.all())
+            elapsed = (time.perf_counter() - started) / repeat
+            results[name] = (queryset.explain(), elapsed)
+        return results
+
+    def drop_indexes(self):
+        with connection.cursor() as cursor:
+            for model in (Post, Comment, Follow):
+                for index in model._meta.indexes:
+                    cursor.execute(
+                        'DROP INDEX %s' % connection.ops.quote_name(
+                            index.name)
+                    )
+
+    def handle(self, *args, **options):
+        shapes = self.queries()
+        with transaction.atomic():
+            self.drop_indexes()
+            before = self.measure(shapes, options['repeat'])
+            transaction.set_rollback(True)
+        # Новое соединение: у sqlite3 свой кэш подготовленных запросов,
+        # и старые планы пережили бы откат DROP INDEX.
+        connection.close()
+        after = self.measure(shapes, options['repeat'])
+        for name, _ in shapes:
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            for label, (plan, elapsed) in (
+                    ('без индексов', before[name]),
+                    ('с индексами', after[name])):
+                self.stdout.write(
+                    f'  {label}: {elapsed * 1000:.3f} мс/запрос'
+                )
+                for line in plan.splitlines():
+                    self.stdout.write(f'    {line}')
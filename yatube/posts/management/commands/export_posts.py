@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import export
+from posts.models import Group, Post, User
+
+
+class Command(BaseCommand):
+    help = (
+        'Потоково выгружает посты автора или группы вместе '
+        'с комментариями в NDJSON или CSV.'
+    )
+
+    def add_arguments(self, parser):
+        source = parser.add_mutually_exclusive_group()
+        source.add_argument('--author', help='username автора.')
+        source.add_argument('--group', help='slug группы.')
+        parser.add_argument(
+            '--format', choices=list(export.FORMATS), default='ndjson'
+        )
+        parser.add_argument(
+            '--output', help='Файл; по умолчанию стандартный вывод.'
+        )
+
+    def handle(self, *args, **options):
+        queryset = Post.objects.all()
+        if options['author']:
+            try:
+                queryset = User.objects.get(
+                    username=options['author']
+                ).posts.all()
+            except User.DoesNotExist:
+                raise CommandError('Автор не найден')
+        elif options['group']:
+            try:
+                queryset = Group.objects.get(slug=options['group']).posts.all()
+            except Group.DoesNotExist:
+                raise CommandError('Группа не найдена')
+        chunks = export.iter_export(queryset, options['format'])
+        if not options['output']:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
+            return
+        with open(options['output'], 'w', encoding='utf-8',
+                  newline='') as target:
+            target.writelines(chunks)
+        self.stderr.write(self.style.SUCCESS(
+            f'Выгрузка записана в {options["output"]}'
+        ))
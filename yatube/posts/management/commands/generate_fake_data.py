@@ -0,0 +1,182 @@
+import random
+from datetime import timedelta
+from itertools import accumulate, islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from faker import Faker
+
+from posts.importer import explicit_dates, rebuild
+from posts.models import Comment, Follow, Group, Post, User
+from posts.rendering import render_text
+
+CHUNK_SIZE = 5000
+
+
+def chunked(objects, size=CHUNK_SIZE):
+    objects = iter(objects)
+    while True:
+        chunk = list(islice(objects, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу синтетическими пользователями, группами, постами, '
+        'подписками и комментариями для нагрузочных замеров.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=50)
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--comments', type=int, default=20000)
+        parser.add_argument(
+            '--follows', type=int, default=20,
+            help='Среднее число подписок на пользователя.'
+        )
+        parser.add_argument(
+            '--alpha', type=float, default=1.2,
+            help='Показатель степенного закона популярности авторов.'
+        )
+        parser.add_argument('--days', type=int, default=365)
+        parser.add_argument('--password', default='password')
+        parser.add_argument('--seed', type=int, default=None)
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.faker = Faker('ru_RU')
+        self.faker.seed_instance(options['seed'])
+        self.now = timezone.now()
+        self.period = timedelta(days=options['days']).total_seconds()
+
+        user_ids = self.create_users(options['users'], options['password'])
+        weights = list(accumulate(
+            1 / rank ** options['alpha']
+            for rank in range(1, len(user_ids) + 1)
+        ))
+        group_ids = self.create_groups(options['groups'])
+        post_ids = self.create_posts(options['posts'], user_ids, group_ids)
+        self.create_follows(
+            options['follows'] * len(user_ids), user_ids, weights
+        )
+        self.create_comments(options['comments'], post_ids, user_ids)
+
+        self.stdout.write(
+            'Пересчёт счётчиков, лент и поискового индекса, сброс кэша'
+        )
+        entries = rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано: пользователей {len(user_ids)}, постов '
+            f'{len(post_ids)}, записей лент {entries}'
+        ))
+
+    def moment(self):
+        return self.now - timedelta(
+            seconds=self.random.random() * self.period
+        )
+
+    def new_ids(self, model, create, total):
+        """Создать объекты пачками и вернуть id созданных.
+
+        bulk_create на SQLite не возвращает первичные ключи, поэтому
+        новые id выбираются по границе, запомненной до вставки.
+        """
+        last = model.objects.order_by('-pk').values_list(
+            'pk', flat=True
+        ).first() or 0
+        for chunk in chunked(create(index) for index in range(total)):
+            with transaction.atomic():
+                model.objects.bulk_create(chunk)
+        return list(model.objects.filter(pk__gt=last).order_by(
+            'pk'
+        ).values_list('pk', flat=True))
+
+    def create_users(self, total, password):
+        password = make_password(password)
+        faker = self.faker
+        suffix = self.random.getrandbits(32)
+
+        def user(index):
+            return User(
+                username=f'{faker.user_name()}_{suffix:x}_{index}',
+                first_name=faker.first_name(),
+                last_name=faker.last_name(),
+                email=faker.email(),
+                password=password,
+                date_joined=self.now,
+            )
+        return self.new_ids(User, user, total)
+
+    def create_groups(self, total):
+        suffix = self.random.getrandbits(32)
+
+        def group(index):
+            title = self.faker.catch_phrase()
+            return Group(
+                title=title[:200],
+                slug=f'group-{suffix:x}-{index}',
+                description=self.faker.paragraph(),
+            )
+        return self.new_ids(Group, group, total)
+
+    def create_posts(self, total, user_ids, group_ids):
+        """Авторы постов равновероятны.
+
+        Если и посты, и подписчиков распределить по одному степенному
+        закону, объём лент растёт как их произведение.
+        """
+        def post(index):
+            pub_date = self.moment()
+            text = self.faker.paragraph(nb_sentences=5)
+            return Post(
+                text=text,
+                **render_text(text),
+                author_id=self.random.choice(user_ids),
+                group_id=(
+                    self.random.choice(group_ids)
+                    if group_ids and self.random.random() < 0.7 else None
+                ),
+                pub_date=pub_date,
+                updated=pub_date,
+            )
+        fields = (
+            Post._meta.get_field('pub_date'),
+            Post._meta.get_field('updated'),
+        )
+        with explicit_dates(*fields):
+            return self.new_ids(Post, post, total)
+
+    def create_follows(self, total, user_ids, weights):
+        """Подписчик выбирается равномерно, автор — по степенному закону."""
+        followers = self.random.choices(user_ids, k=total)
+        authors = self.random.choices(user_ids, cum_weights=weights, k=total)
+        pairs = {
+            pair for pair in zip(followers, authors) if pair[0] != pair[1]
+        }
+        for chunk in chunked(
+            Follow(user_id=user_id, author_id=author_id)
+            for user_id, author_id in pairs
+        ):
+            with transaction.atomic():
+                Follow.objects.bulk_create(chunk, ignore_conflicts=True)
+
+    def create_comments(self, total, post_ids, user_ids):
+        if not post_ids:
+            return
+
+        def comment(index):
+            return Comment(
+                post_id=self.random.choice(post_ids),
+                author_id=self.random.choice(user_ids),
+                text=self.faker.sentence(),
+                pub_date=self.moment(),
+            )
+        with explicit_dates(Comment._meta.get_field('pub_date')):
+            for chunk in chunked(comment(index) for index in range(total)):
+                with transaction.atomic():
+                    Comment.objects.bulk_create(chunk)
@@ -0,0 +1,85 @@
+import os
+import sys
+import time
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import importer
+
+
+class Command(BaseCommand):
+    help = (
+        'Массово загружает группы, посты, комментарии и подписки '
+        'из NDJSON или CSV пачками с возможностью продолжить загрузку.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('source', help='Файл или «-» для stdin.')
+        parser.add_argument(
+            '--format', choices=importer.FORMATS, default=None,
+            help='По умолчанию — по расширению файла.'
+        )
+        parser.add_argument(
+            '--images', help='Каталог с картинками постов.'
+        )
+        parser.add_argument('--batch-size', type=int, default=None)
+        parser.add_argument(
+            '--checkpoint',
+            help='Имя точки продолжения; по умолчанию путь к файлу.'
+        )
+        parser.add_argument(
+            '--restart', action='store_true',
+            help='Начать с начала, а не с сохранённой позиции.'
+        )
+        parser.add_argument(
+            '--no-rebuild', action='store_false', dest='rebuild',
+            help='Не пересчитывать счётчики, ленты и индекс после загрузки.'
+        )
+
+    def handle(self, *args, **options):
+        source = options['source']
+        import_format = options['format'] or (
+            'csv' if source.endswith('.csv') else 'ndjson'
+        )
+        if options['images'] and not os.path.isdir(options['images']):
+            raise CommandError('Каталог с картинками не найден')
+        checkpoint = options['checkpoint']
+        if checkpoint is None and source != '-':
+            checkpoint = os.path.abspath(source)
+        loader = importer.Importer(
+            images_dir=options['images'], batch_size=options['batch_size']
+        )
+        started = time.perf_counter()
+        try:
+            stream = (
+                sys.stdin if source == '-'
+                else open(source, encoding='utf-8', newline='')
+            )
+        except OSError as error:
+            raise CommandError(f'Не удалось открыть {source}: {error}')
+        with stream:
+            position = loader.run(
+                importer.read_records(stream, import_format),
+                checkpoint=checkpoint, restart=options['restart']
+            )
+        stats = loader.stats
+        self.stdout.write(
+            f'Записей {position} за {time.perf_counter() - started:.1f} с: '
+            f'постов {stats["posts"]}, комментариев {stats["comments"]}, '
+            f'подписок {stats["follows"]}, групп {stats["groups"]}, '
+            f'пользователей {stats["users"]}, картинок {stats["images"]}, '
+            f'пропущено {stats["skipped"]}'
+        )
+        if stats['missing_images']:
+            self.stderr.write(
+                f'Не найдено картинок: {stats["missing_images"]}'
+            )
+        if options['rebuild']:
+            entries = loader.rebuild()
+            if stats['images']:
+                call_command('build_renditions', stdout=self.stdout)
+            self.stdout.write(self.style.SUCCESS(
+                f'Пересчитаны счётчики, поисковый индекс и {entries} '
+                f'записей лент'
+            ))
@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.recommendations import refresh, stale_users
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает рекомендации «Кого почитать» по общим подпискам. '
+        'По умолчанию только для читателей, чьи подписки или подписки '
+        'их авторов изменились.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full', action='store_true',
+            help='Пересчитать рекомендации всех пользователей.'
+        )
+        parser.add_argument('--limit', type=int, default=None)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        users, total = refresh(
+            None if options['full'] else list(stale_users()),
+            options['limit']
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Читателей: {users}, рекомендаций: {total}, '
+            f'за {time.perf_counter() - started:.1f} с'
+        ))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.counters import recount, recount_images
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает денормализованные счётчики постов и подписок.'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            recount()
+            recount_images()
+        self.stdout.write(self.style.SUCCESS('Счётчики пересчитаны'))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from posts import feed
+from posts.models import FeedEntry, Follow
+
+
+class Command(BaseCommand):
+    help = 'Сверяет материализованные ленты с подписками и чинит расхождения.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', type=int, action='append', dest='users',
+            help='id пользователя; по умолчанию все.'
+        )
+
+    def handle(self, *args, **options):
+        users = options['users']
+        if not users:
+            users = set(Follow.objects.values_list('user_id', flat=True))
+            users.update(FeedEntry.objects.values_list('user_id', flat=True))
+            users = sorted(users)
+        added = removed = 0
+        for user_id in users:
+            missing, stale = feed.repair(user_id)
+            added += missing
+            removed += stale
+        self.stdout.write(self.style.SUCCESS(
+            f'Лент проверено: {len(users)}, '
+            f'добавлено записей: {added}, удалено: {removed}'
+        ))
@@ -0,0 +1,29 @@
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+
+class Command(BaseCommand):
+    help = (
+        'Копирует основную базу SQLite в файлы реплик из '
+        'DATABASE_REPLICAS через backup API (без остановки записи).'
+    )
+
+    def handle(self, *args, **options):
+        source = connections['default'].settings_dict
+        if connections['default'].vendor != 'sqlite':
+            raise CommandError(
+                'Реплики других СУБД настраиваются их репликацией'
+            )
+        for alias in settings.DATABASE_REPLICAS:
+            target = connections[alias].settings_dict['NAME']
+            connections[alias].close()
+            with sqlite3.connect(source['NAME']) as origin, \
+                    sqlite3.connect(target) as replica:
+                origin.backup(replica)
+            self.stdout.write(f'{alias}: {target}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Обновлено реплик: {len(settings.DATABASE_REPLICAS)}'
+        ))
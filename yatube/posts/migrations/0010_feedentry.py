@@ -0,0 +1,33 @@
+# Generated by Django 2.2.16 on 2026-10-18 16:39
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0009_auto_20230507_1746'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('post', models.ForeignKey(help_text='Пост ленты', on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries', to='posts.Post', verbose_name='Пост ленты')),
+                ('user', models.ForeignKey(help_text='Читатель ленты', on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries', to=settings.AUTH_USER_MODEL, verbose_name='Читатель ленты')),
+            ],
+            options={
+                'unique_together': {('user', 'post')},
+            },
+        ),
+        migrations.RunSQL(
+            'INSERT INTO posts_feedentry (user_id, post_id) '
+            'SELECT DISTINCT f.user_id, p.id FROM posts_follow f '
+            'INNER JOIN posts_post p ON p.author_id = f.author_id',
+            migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.16 on 2026-10-18 16:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0010_feedentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='image_renditions',
+            field=models.TextField(blank=True, editable=False, help_text='URL заранее построенных превью в JSON', verbose_name='Превью картинки'),
+        ),
+    ]
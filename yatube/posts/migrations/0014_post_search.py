@@ -0,0 +1,41 @@
+from django.db import migrations
+from django.db.utils import OperationalError
+
+from posts.search import FTS_TABLE, tokenize
+
+
+def create_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    Post = apps.get_model('posts', 'Post')
+    with connection.cursor() as cursor:
+        try:
+            cursor.execute(
+                f'CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(body)'
+            )
+        except OperationalError:
+            return
+        for post_id, text in Post.objects.values_list(
+                'pk', 'text').iterator():
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, body) VALUES (%s, %s)',
+                [post_id, ' '.join(tokenize(text))]
+            )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 2.2.16 on 2026-10-18 16:51
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def set_updated_from_pub_date(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    Post.objects.update(updated=F('pub_date'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_post_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='updated',
+            field=models.DateTimeField(auto_now=True, verbose_name='Дата изменения'),
+        ),
+        migrations.RunPython(
+            set_updated_from_pub_date, migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 2.2.16 on 2026-10-18 17:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_post_updated_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportCheckpoint',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text='Имя загрузки, обычно путь к исходному файлу', max_length=255, unique=True, verbose_name='Загрузка')),
+                ('position', models.BigIntegerField(default=0, verbose_name='Загружено записей')),
+                ('updated', models.DateTimeField(auto_now=True, verbose_name='Дата изменения')),
+            ],
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 2.2.16 on 2026-10-18 17:28
+
+from django.db import migrations, models
+import posts.storage
+
+from posts.counters import recount_images
+
+
+def count_image_refs(apps, schema_editor):
+    recount_images(apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0017_import_checkpoint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageBlob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text='Имя файла в хранилище картинок постов', max_length=100, unique=True, verbose_name='Файл')),
+                ('refs', models.PositiveIntegerField(default=0, verbose_name='Количество постов')),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='image',
+            field=models.ImageField(blank=True, storage=posts.storage.ContentAddressedStorage(), upload_to='posts/', verbose_name='Картинка'),
+        ),
+        migrations.RunPython(count_image_refs, migrations.RunPython.noop),
+    ]
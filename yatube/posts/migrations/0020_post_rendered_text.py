@@ -0,0 +1,35 @@
+# Generated by Django 2.2.16 on 2026-10-18 17:34
+
+from django.db import migrations, models
+
+from posts.rendering import backfill
+
+
+def render_post_text(apps, schema_editor):
+    backfill(apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0019_post_image_size'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='excerpt',
+            field=models.CharField(blank=True, editable=False, max_length=160, verbose_name='Выдержка'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='text_html',
+            field=models.TextField(blank=True, editable=False, help_text='Текст, заранее отрисованный при сохранении', verbose_name='HTML текста'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='title',
+            field=models.CharField(blank=True, editable=False, max_length=30, verbose_name='Заголовок'),
+        ),
+        migrations.RunPython(render_post_text, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 2.2.16 on 2026-10-18 17:45
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0020_post_rendered_text'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='recommendations_stale',
+            field=models.BooleanField(default=True, verbose_name='Рекомендации устарели'),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='recommendations_updated',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Дата расчёта рекомендаций'),
+        ),
+        migrations.CreateModel(
+            name='Recommendation',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField(help_text='Коэффициент Жаккара подписок читателя и подписчиков автора', verbose_name='Оценка')),
+                ('overlap', models.PositiveIntegerField(help_text='Сколько авторов из подписок читателя подписаны на автора', verbose_name='Общих подписок')),
+                ('author', models.ForeignKey(help_text='Рекомендованный автор', on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Рекомендованный автор')),
+                ('user', models.ForeignKey(help_text='Кому рекомендован автор', on_delete=django.db.models.deletion.CASCADE, related_name='recommendations', to=settings.AUTH_USER_MODEL, verbose_name='Читатель')),
+            ],
+            options={
+                'ordering': ('-score', '-overlap'),
+            },
+        ),
+        migrations.AddIndex(
+            model_name='recommendation',
+            index=models.Index(fields=['user', '-score'], name='recommendation_user_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='recommendation',
+            constraint=models.UniqueConstraint(fields=('user', 'author'), name='unique_recommendation'),
+        ),
+    ]
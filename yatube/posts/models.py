@@ -1,8 +1,15 @@
+import json
+
 from django.contrib.auth import get_user_model
 from django.db import models
 
 from core.models import CreatedModel
 
+from .rendering import (
+    EXCERPT_LENGTH, RENDERED_FIELDS, TITLE_LENGTH, render_text
+)
+from .storage import image_storage
+
 User = get_user_model()
 
 
@@ -21,18 +28,60 @@ class Group(CreatedModel):
         verbose_name="Название",
         help_text="Укажите описание группы"
     )
+    posts_count = models.PositiveIntegerField(
+        'Количество постов',
+        default=0,
+        editable=False
+    )
 
     def __str__(self):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    """Запись текста через update и bulk_update перерисовывает его HTML."""
+
+    def update(self, **kwargs):
+        if isinstance(kwargs.get('text'), str):
+            kwargs.update(render_text(kwargs['text']))
+        return super().update(**kwargs)
+
+    def bulk_update(self, objs, fields, batch_size=None):
+        objs = tuple(objs)
+        if 'text' in fields:
+            for obj in objs:
+                for field, value in render_text(obj.text).items():
+                    setattr(obj, field, value)
+            fields = [*fields, *RENDERED_FIELDS]
+        return super().bulk_update(objs, fields, batch_size=batch_size)
+
+
 class Post(CreatedModel):
     CONSTANT_STR = 15
     text = models.TextField(
         verbose_name="Текст",
         help_text="Укажите текст поста"
     )
+    text_html = models.TextField(
+        'HTML текста',
+        blank=True,
+        editable=False,
+        help_text='Текст, заранее отрисованный при сохранении'
+    )
+    title = models.CharField(
+        'Заголовок',
+        max_length=TITLE_LENGTH,
+        blank=True,
+        editable=False
+    )
+    excerpt = models.CharField(
+        'Выдержка',
+        max_length=EXCERPT_LENGTH,
+        blank=True,
+        editable=False
+    )
     pub_date = models.DateTimeField(auto_now_add=True)
+    updated = models.DateTimeField('Дата изменения', auto_now=True)
     group = models.ForeignKey(
         Group,
         on_delete=models.SET_NULL,
@@ -52,15 +101,74 @@ class Post(CreatedModel):
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
+        storage=image_storage,
         blank=True
     )
+    comments_count = models.PositiveIntegerField(
+        'Количество комментариев',
+        default=0,
+        editable=False
+    )
+    image_width = models.PositiveIntegerField(
+        'Ширина картинки',
+        null=True,
+        blank=True,
+        editable=False
+    )
+    image_height = models.PositiveIntegerField(
+        'Высота картинки',
+        null=True,
+        blank=True,
+        editable=False
+    )
+    image_renditions = models.TextField(
+        'Превью картинки',
+        blank=True,
+        editable=False,
+        help_text='URL заранее построенных превью в JSON'
+    )
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ('-pub_date', )
+        indexes = (
+            models.Index(fields=('-pub_date', '-id'), name='post_feed_idx'),
+            models.Index(
+                fields=('group', '-pub_date', '-id'),
+                name='post_group_feed_idx'
+            ),
+            models.Index(
+                fields=('author', '-pub_date', '-id'),
+                name='post_author_feed_idx'
+            ),
+            models.Index(
+                fields=('author', '-updated'),
+                name='post_author_updated_idx'
+            ),
+            models.Index(
+                fields=('group', '-updated'),
+                name='post_group_updated_idx'
+            ),
+        )
 
     def __str__(self):
         return self.text[:self.CONSTANT_STR]
 
+    def save(self, *args, **kwargs):
+        for field, value in render_text(self.text).items():
+            setattr(self, field, value)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'text' in update_fields:
+            kwargs['update_fields'] = {*update_fields, *RENDERED_FIELDS}
+        super().save(*args, **kwargs)
+
+    def rendition_url(self, name):
+        try:
+            return json.loads(self.image_renditions).get(name)
+        except (ValueError, AttributeError):
+            return None
+
 
 class Comment(CreatedModel):
     post = models.ForeignKey(
@@ -84,6 +192,11 @@ class Comment(CreatedModel):
 
     class Meta:
         ordering = ('-pub_date',)
+        indexes = (
+            models.Index(
+                fields=('post', '-pub_date', '-id'), name='comment_post_idx'
+            ),
+        )
 
     def __str__(self):
         return self.text[:self.CONSTANT_STR]
@@ -103,4 +216,149 @@ class Follow(models.Model):
         related_name='following',
         verbose_name='Автор подписки',
         help_text='Автор подписки',
-    )
\ No newline at end of file
+    )
+
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'author'), name='unique_follow'
+            ),
+        )
+        indexes = (
+            models.Index(fields=('author', 'user'), name='follow_author_idx'),
+        )
+
+
+class FeedEntry(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Читатель ленты',
+        help_text='Читатель ленты',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Пост ленты',
+        help_text='Пост ленты',
+    )
+
+    class Meta:
+        unique_together = ('user', 'post')
+
+
+class Profile(models.Model):
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        related_name='profile',
+        verbose_name='Пользователь',
+        help_text='Пользователь',
+    )
+    posts_count = models.PositiveIntegerField(
+        'Количество постов',
+        default=0
+    )
+    followers_count = models.PositiveIntegerField(
+        'Количество подписчиков',
+        default=0
+    )
+    following_count = models.PositiveIntegerField(
+        'Количество подписок',
+        default=0
+    )
+    recommendations_stale = models.BooleanField(
+        'Рекомендации устарели',
+        default=True
+    )
+    recommendations_updated = models.DateTimeField(
+        'Дата расчёта рекомендаций',
+        null=True,
+        blank=True
+    )
+
+    def __str__(self):
+        return str(self.user)
+
+
+class Recommendation(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='recommendations',
+        verbose_name='Читатель',
+        help_text='Кому рекомендован автор',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Рекомендованный автор',
+        help_text='Рекомендованный автор',
+    )
+    score = models.FloatField(
+        'Оценка',
+        help_text='Коэффициент Жаккара подписок читателя и подписчиков автора'
+    )
+    overlap = models.PositiveIntegerField(
+        'Общих подписок',
+        help_text='Сколько авторов из подписок читателя подписаны на автора'
+    )
+
+    class Meta:
+        ordering = ('-score', '-overlap')
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'author'), name='unique_recommendation'
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=('user', '-score'), name='recommendation_user_idx'
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.user} -> {self.author}'
+
+
+class ImageBlob(models.Model):
+    name = models.CharField(
+        'Файл',
+        max_length=100,
+        unique=True,
+        help_text='Имя файла в хранилище картинок постов'
+    )
+    refs = models.PositiveIntegerField(
+        'Количество постов',
+        default=0
+    )
+
+    def __str__(self):
+        return self.name
+
+
+class ImportCheckpoint(models.Model):
+    name = models.CharField(
+        'Загрузка',
+        max_length=255,
+        unique=True,
+        help_text='Имя загрузки, обычно путь к исходному файлу'
+    )
+    position = models.BigIntegerField(
+        'Загружено записей',
+        default=0
+    )
+    updated = models.DateTimeField('Дата изменения', auto_now=True)
+
+    def __str__(self):
+        return f'{self.name}: {self.position}'
+
+
+def get_profile(user):
+    try:
+        return user.profile
+    except Profile.DoesNotExist:
+        return Profile.objects.get_or_create(user=user)[0]
@@ -0,0 +1,110 @@
+from collections.abc import Sequence
+
+from django.core import signing
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+CURSOR_SALT = 'posts.cursor'
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+class CursorPage(Sequence):
+    """Страница keyset-пагинации без подсчёта общего количества записей."""
+    is_cursor = True
+
+    def __init__(self, object_list, paginator,
+                 next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return '<Cursor page of %s items>' % len(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """Пагинация по ключу (pub_date, id) от новых записей к старым.
+
+    Вместо OFFSET каждая страница начинается с условия по ключу
+    последней записи предыдущей страницы, поэтому время выборки
+    глубоких страниц не растёт с их номером.
+    """
+
+    def __init__(self, object_list, per_page):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+
+    @staticmethod
+    def encode_cursor(obj, direction):
+        return signing.dumps(
+            (obj.pub_date.isoformat(), obj.pk, direction),
+            salt=CURSOR_SALT
+        )
+
+    @staticmethod
+    def decode_cursor(cursor):
+        try:
+            pub_date, pk, direction = signing.loads(cursor, salt=CURSOR_SALT)
+        except (signing.BadSignature, TypeError, ValueError):
+            return None
+        pub_date = parse_datetime(pub_date)
+        if pub_date is None or direction not in (NEXT, PREVIOUS):
+            return None
+        return pub_date, pk, direction
+
+    def get_page(self, cursor=None):
+        """Вернуть страницу по курсору, при неверном курсоре — первую."""
+        position = self.decode_cursor(cursor) if cursor else None
+        if position is None:
+            return self._forward_page(self.object_list, first=True)
+        pub_date, pk, direction = position
+        if direction == NEXT:
+            return self._forward_page(self.object_list.filter(
+                Q(pub_date__lt=pub_date) | Q(pub_date=pub_date, pk__lt=pk)
+            ))
+        return self._backward_page(self.object_list.filter(
+            Q(pub_date__gt=pub_date) | Q(pub_date=pub_date, pk__gt=pk)
+        ))
+
+    def _forward_page(self, queryset, first=False):
+        rows = list(
+            queryset.order_by('-pub_date', '-pk')[:self.per_page + 1]
+        )
+        has_next = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        return self._page(rows, has_next, not first and bool(rows))
+
+    def _backward_page(self, queryset):
+        rows = list(
+            queryset.order_by('pub_date', 'pk')[:self.per_page + 1]
+        )
+        has_previous = len(rows) > self.per_page
+        rows = rows[:self.per_page][::-1]
+        if not rows:
+            return self.get_page()
+        return self._page(rows, True, has_previous)
+
+    def _page(self, rows, has_next, has_previous):
+        next_cursor = previous_cursor = None
+        if has_next and rows:
+            next_cursor = self.encode_cursor(rows[-1], NEXT)
+        if has_previous and rows:
+            previous_cursor = self.encode_cursor(rows[0], PREVIOUS)
+        return CursorPage(rows, self, next_cursor, previous_cursor)
@@ -0,0 +1,220 @@
+import math
+import re
+import threading
+from collections import Counter, defaultdict
+from itertools import islice
+
+from django.conf import settings
+from django.core import signing
+from django.db import connection, transaction
+
+from .models import Post
+from .stemmer import stem
+
+CURSOR_SALT = 'posts.search'
+FTS_TABLE = 'posts_search'
+WORD = re.compile(r'\w+')
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def tokenize(text):
+    return [stem(word) for word in WORD.findall(text.lower())]
+
+
+def document(post):
+    return ' '.join(tokenize(post.text))
+
+
+def fts_available(conn=connection):
+    if conn.vendor != 'sqlite':
+        return False
+    with conn.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s",
+            [FTS_TABLE]
+        )
+        return cursor.fetchone() is not None
+
+
+class SQLiteBackend:
+    """Индекс FTS5; русские слова приводятся к основам до записи."""
+
+    def index(self, post):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post.pk]
+            )
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, body) VALUES (%s, %s)',
+                [post.pk, document(post)]
+            )
+
+    def remove(self, post_id):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post_id]
+            )
+
+    def reindex(self):
+        """Перестроить индекс в одной транзакции.
+
+        Без неё каждая вставка фиксируется отдельно, и перестройка
+        упирается в тысячи коммитов; читатели до конца видят старый индекс.
+        """
+        posts = Post.objects.values_list('pk', 'text').iterator()
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+            while True:
+                batch = list(islice(posts, settings.FEED_BATCH_SIZE))
+                if not batch:
+                    return
+                cursor.executemany(
+                    f'INSERT INTO {FTS_TABLE} (rowid, body) VALUES (%s, %s)',
+                    [(pk, ' '.join(tokenize(text))) for pk, text in batch]
+                )
+
+    def search(self, terms, after=None, limit=10):
+        """Вернуть [(score, post_id)], лучшие первыми (bm25 меньше — лучше)."""
+        match = ' '.join('"%s"' % term.replace('"', '') for term in terms)
+        sql = (
+            f'SELECT score, id FROM ('
+            f'SELECT bm25({FTS_TABLE}) AS score, rowid AS id '
+            f'FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s)'
+        )
+        params = [match]
+        if after is not None:
+            sql += ' WHERE score > %s OR (score = %s AND id > %s)'
+            params += [after[0], after[0], after[1]]
+        sql += ' ORDER BY score, id LIMIT %s'
+        params.append(limit)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+
+
+class InvertedIndexBackend:
+    """Инвертированный индекс в памяти процесса для БД без FTS5.
+
+    Строится из базы при первом поиске и дальше обновляется сигналами.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.loaded = False
+        self.postings = defaultdict(dict)
+        self.terms = {}
+        self.lengths = {}
+
+    def _load(self):
+        for post in Post.objects.only('pk', 'text').iterator():
+            self._add(post.pk, tokenize(post.text))
+        self.loaded = True
+
+    def _add(self, post_id, tokens):
+        self._discard(post_id)
+        frequencies = Counter(tokens)
+        for term, frequency in frequencies.items():
+            self.postings[term][post_id] = frequency
+        self.terms[post_id] = tuple(frequencies)
+        self.lengths[post_id] = len(tokens)
+
+    def _discard(self, post_id):
+        self.lengths.pop(post_id, None)
+        for term in self.terms.pop(post_id, ()):
+            documents = self.postings[term]
+            documents.pop(post_id, None)
+            if not documents:
+                del self.postings[term]
+
+    def index(self, post):
+        with self.lock:
+            if self.loaded:
+                self._add(post.pk, tokenize(post.text))
+
+    def remove(self, post_id):
+        with self.lock:
+            if self.loaded:
+                self._discard(post_id)
+
+    def reindex(self):
+        with self.lock:
+            self.postings.clear()
+            self.terms.clear()
+            self.lengths.clear()
+            self._load()
+
+    def search(self, terms, after=None, limit=10):
+        with self.lock:
+            if not self.loaded:
+                self._load()
+            matches = [self.postings.get(term, {}) for term in terms]
+            if not matches or not all(matches):
+                return []
+            total = len(self.lengths)
+            average = sum(self.lengths.values()) / total
+            scores = defaultdict(float)
+            candidates = set.intersection(*(set(m) for m in matches))
+            for documents in matches:
+                idf = math.log(
+                    1 + (total - len(documents) + 0.5)
+                    / (len(documents) + 0.5)
+                )
+                for post_id in candidates:
+                    frequency = documents[post_id]
+                    norm = BM25_K1 * (
+                        1 - BM25_B
+                        + BM25_B * self.lengths[post_id] / average
+                    )
+                    scores[post_id] -= idf * frequency * (BM25_K1 + 1) / (
+                        frequency + norm
+                    )
+        ranked = sorted((score, post_id) for post_id, score in scores.items())
+        if after is not None:
+            ranked = [item for item in ranked if item > tuple(after)]
+        return ranked[:limit]
+
+
+_backend = None
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        _backend = SQLiteBackend() if fts_available() else (
+            InvertedIndexBackend()
+        )
+    return _backend
+
+
+def encode_cursor(score, post_id):
+    return signing.dumps((score, post_id), salt=CURSOR_SALT)
+
+
+def decode_cursor(cursor):
+    try:
+        score, post_id = signing.loads(cursor, salt=CURSOR_SALT)
+        return float(score), int(post_id)
+    except (signing.BadSignature, TypeError, ValueError):
+        return None
+
+
+def search_posts(query, cursor=None, limit=None):
+    """Найти посты по запросу: (посты по убыванию релевантности, курсор)."""
+    limit = limit or settings.QUANTITY_POSTS
+    terms = list(dict.fromkeys(tokenize(query)))
+    if not terms:
+        return [], None
+    after = decode_cursor(cursor) if cursor else None
+    rows = get_backend().search(terms, after, limit + 1)
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(*rows[-1])
+    posts = Post.objects.select_related('author', 'group').in_bulk(
+        [post_id for _, post_id in rows]
+    )
+    return [
+        posts[post_id] for _, post_id in rows if post_id in posts
+    ], next_cursor
@@ -0,0 +1,224 @@
+from django.db.models.signals import (
+    post_delete, post_save, pre_delete, pre_save
+)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import (
+    cache, counters, feed, recommendations, search, storage, timeline
+)
+from .graph import graph
+from .models import Comment, Follow, Group, Post, Profile, User
+
+
+@receiver(post_save, sender=User)
+def create_profile(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        Profile.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=Post)
+def count_saved_post(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        counters.adjust_profile(instance.author_id, 'posts_count', 1)
+        counters.adjust(Group, instance.group_id, 'posts_count', 1)
+        return
+    previous_group_id = getattr(
+        instance, '_previous_group_id', instance.group_id
+    )
+    if previous_group_id != instance.group_id:
+        counters.adjust(Group, previous_group_id, 'posts_count', -1)
+        counters.adjust(Group, instance.group_id, 'posts_count', 1)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    counters.adjust_profile(instance.author_id, 'posts_count', -1)
+    counters.adjust(Group, instance.group_id, 'posts_count', -1)
+
+
+@receiver(post_save, sender=Comment)
+def count_saved_comment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.adjust(Post, instance.post_id, 'comments_count', 1)
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    counters.adjust(Post, instance.post_id, 'comments_count', -1)
+
+
+@receiver(post_save, sender=Follow)
+def count_saved_follow(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.adjust_profile(instance.author_id, 'followers_count', 1)
+        counters.adjust_profile(instance.user_id, 'following_count', 1)
+
+
+@receiver(post_delete, sender=Follow)
+def count_deleted_follow(sender, instance, **kwargs):
+    counters.adjust_profile(instance.author_id, 'followers_count', -1)
+    counters.adjust_profile(instance.user_id, 'following_count', -1)
+
+
+@receiver(post_save, sender=Post)
+def fanout_new_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        feed.fanout_post(instance)
+
+
+@receiver(post_save, sender=Follow)
+def add_followed_author(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        feed.add_author(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def remove_unfollowed_author(sender, instance, **kwargs):
+    feed.remove_author(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Post)
+def forget_recent_posts_on_create(sender, instance, created, raw=False,
+                                  **kwargs):
+    if created and not raw:
+        timeline.forget_posts(instance.author_id)
+
+
+@receiver(post_delete, sender=Post)
+def forget_recent_posts(sender, instance, **kwargs):
+    timeline.forget_posts(instance.author_id)
+
+
+@receiver(post_save, sender=Follow)
+def add_graph_edge(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        graph.added(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def remove_graph_edge(sender, instance, **kwargs):
+    graph.removed(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Follow)
+def mark_recommendations_stale(sender, instance, created, raw=False,
+                               **kwargs):
+    if created and not raw:
+        recommendations.follow_changed(
+            instance.user_id, instance.author_id, created=True
+        )
+
+
+@receiver(post_delete, sender=Follow)
+def mark_recommendations_stale_on_unfollow(sender, instance, **kwargs):
+    recommendations.follow_changed(
+        instance.user_id, instance.author_id, created=False
+    )
+
+
+@receiver(pre_save, sender=Post)
+def remember_post_scopes(sender, instance, raw=False, **kwargs):
+    if raw or instance.pk is None:
+        return
+    previous = Post.objects.select_related('author', 'group').filter(
+        pk=instance.pk
+    ).first()
+    if previous is not None:
+        instance._previous_cache_scopes = cache.post_scopes(previous)
+        instance._previous_group_id = previous.group_id
+        instance._previous_image = previous.image.name
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post_pages(sender, instance, **kwargs):
+    cache.bump(
+        *cache.post_scopes(instance),
+        *getattr(instance, '_previous_cache_scopes', ())
+    )
+
+
+@receiver(pre_save, sender=Group)
+def remember_group_slug(sender, instance, raw=False, **kwargs):
+    if raw or instance.pk is None:
+        return
+    instance._previous_slug = Group.objects.filter(
+        pk=instance.pk
+    ).values_list('slug', flat=True).first()
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_group_pages(sender, instance, **kwargs):
+    cache.bump(
+        'groups',
+        f'group:{instance.slug}',
+        f'group:{getattr(instance, "_previous_slug", instance.slug)}'
+    )
+
+
+@receiver(post_save, sender=Group)
+def refresh_group_cards(sender, instance, created, raw=False, **kwargs):
+    previous = getattr(instance, '_previous_slug', instance.slug)
+    if not (created or raw) and previous != instance.slug:
+        instance.posts.update(updated=timezone.now())
+
+
+@receiver(pre_delete, sender=Group)
+def refresh_ungrouped_cards(sender, instance, **kwargs):
+    instance.posts.update(updated=timezone.now())
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_commented_post_pages(sender, instance, **kwargs):
+    cache.bump(*cache.post_scopes(instance.post))
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_follower_pages(sender, instance, **kwargs):
+    cache.bump(f'follow:{instance.user_id}')
+
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.get_backend().index(instance)
+
+
+@receiver(post_delete, sender=Post)
+def unindex_post(sender, instance, **kwargs):
+    search.get_backend().remove(instance.pk)
+
+
+@receiver(pre_save, sender=Post)
+def remember_upload(sender, instance, raw=False, **kwargs):
+    # Сигнал идёт до записи файла полем: новую загрузку ещё видно.
+    instance._image_uploaded = (
+        not raw and bool(instance.image) and not instance.image._committed
+    )
+
+
+@receiver(post_save, sender=Post)
+def count_image_refs(sender, instance, created, raw=False, **kwargs):
+    """Ссылку на загруженный файл взял ContentAddressedStorage._save()."""
+    if raw:
+        return
+    previous = None if created else getattr(
+        instance, '_previous_image', instance.image.name
+    )
+    uploaded = getattr(instance, '_image_uploaded', False)
+    if previous == instance.image.name and not uploaded:
+        return
+    if not uploaded:
+        storage.retain(instance.image.name)
+    storage.release(previous)
+
+
+@receiver(post_delete, sender=Post)
+def release_image(sender, instance, **kwargs):
+    storage.release(instance.image.name)
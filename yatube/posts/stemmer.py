@@ -0,0 +1,143 @@
+"""Стеммер Snowball для русского языка (алгоритм Портера)."""
+import re
+from functools import lru_cache
+
+VOWELS = 'аеиоуыэюя'
+
+PERFECTIVE_GERUND = (
+    ('в', 'вши', 'вшись'),
+    ('ив', 'ивши', 'ившись', 'ыв', 'ывши', 'ывшись'),
+)
+ADJECTIVE = (
+    'ее', 'ие', 'ые', 'ое', 'ими', 'ыми', 'ей', 'ий', 'ый', 'ой', 'ем',
+    'им', 'ым', 'ом', 'его', 'ого', 'ему', 'ому', 'их', 'ых', 'ую', 'юю',
+    'ая', 'яя', 'ою', 'ею',
+)
+PARTICIPLE = (
+    ('ем', 'нн', 'вш', 'ющ', 'щ'),
+    ('ивш', 'ывш', 'ующ'),
+)
+REFLEXIVE = ('ся', 'сь')
+VERB = (
+    ('ла', 'на', 'ете', 'йте', 'ли', 'й', 'л', 'ем', 'н', 'ло', 'но',
+     'ет', 'ют', 'ны', 'ть', 'ешь', 'нно'),
+    ('ила', 'ыла', 'ена', 'ейте', 'уйте', 'ите', 'или', 'ыли', 'ей',
+     'уй', 'ил', 'ыл', 'им', 'ым', 'ен', 'ило', 'ыло', 'ено', 'ят',
+     'ует', 'уют', 'ит', 'ыт', 'ены', 'ить', 'ыть', 'ишь', 'ую', 'ю'),
+)
+NOUN = (
+    'а', 'ев', 'ов', 'ие', 'ье', 'е', 'иями', 'ями', 'ами', 'еи', 'ии',
+    'и', 'ией', 'ей', 'ой', 'ий', 'й', 'иям', 'ям', 'ием', 'ем', 'ам',
+    'ом', 'о', 'у', 'ах', 'иях', 'ях', 'ы', 'ь', 'ию', 'ью', 'ю', 'ия',
+    'ья', 'я',
+)
+SUPERLATIVE = ('ейш', 'ейше')
+DERIVATIONAL = ('ост', 'ость')
+
+CYRILLIC = re.compile('^[а-я]+$')
+STEM_CACHE_SIZE = 100000
+
+
+def _longest_first(endings):
+    return tuple(sorted(endings, key=len, reverse=True))
+
+
+def _grouped(groups):
+    """Окончания обеих групп от длинных к коротким с флагом «после а/я»."""
+    first, second = groups
+    candidates = [(ending, True) for ending in first]
+    candidates += [(ending, False) for ending in second]
+    return tuple(sorted(
+        candidates, key=lambda item: len(item[0]), reverse=True
+    ))
+
+
+PERFECTIVE_GERUND_ENDINGS = _grouped(PERFECTIVE_GERUND)
+PARTICIPLE_ENDINGS = _grouped(PARTICIPLE)
+VERB_ENDINGS = _grouped(VERB)
+REFLEXIVE_ENDINGS = _longest_first(REFLEXIVE)
+ADJECTIVE_ENDINGS = _longest_first(ADJECTIVE)
+NOUN_ENDINGS = _longest_first(NOUN)
+SUPERLATIVE_ENDINGS = _longest_first(SUPERLATIVE)
+DERIVATIONAL_ENDINGS = _longest_first(DERIVATIONAL)
+
+
+def _regions(word):
+    rv = r1 = r2 = len(word)
+    for index, char in enumerate(word):
+        if char in VOWELS:
+            rv = index + 1
+            break
+    for index in range(1, len(word)):
+        if word[index - 1] in VOWELS and word[index] not in VOWELS:
+            r1 = index + 1
+            break
+    for index in range(r1 + 1, len(word)):
+        if word[index - 1] in VOWELS and word[index] not in VOWELS:
+            r2 = index + 1
+            break
+    return rv, r1, r2
+
+
+def _strip(word, start, endings, after_a=False):
+    """Отрезать первое подходящее окончание, целиком лежащее после start.
+
+    Окончания передаются от длинных к коротким; after_a — окончание
+    должно идти после «а» или «я» (они остаются).
+    """
+    for ending in endings:
+        cut = len(word) - len(ending)
+        if not word.endswith(ending) or cut < start:
+            continue
+        if after_a and (cut - 1 < start or word[cut - 1] not in 'ая'):
+            continue
+        return word[:cut], True
+    return word, False
+
+
+def _strip_grouped(word, start, candidates):
+    for ending, after_a in candidates:
+        stripped, removed = _strip(word, start, (ending,), after_a)
+        if removed:
+            return stripped, True
+    return word, False
+
+
+def _step_1(word, rv):
+    word, removed = _strip_grouped(word, rv, PERFECTIVE_GERUND_ENDINGS)
+    if removed:
+        return word
+    word, _ = _strip(word, rv, REFLEXIVE_ENDINGS)
+    word, removed = _strip(word, rv, ADJECTIVE_ENDINGS)
+    if removed:
+        word, _ = _strip_grouped(word, rv, PARTICIPLE_ENDINGS)
+        return word
+    word, removed = _strip_grouped(word, rv, VERB_ENDINGS)
+    if removed:
+        return word
+    word, _ = _strip(word, rv, NOUN_ENDINGS)
+    return word
+
+
+def _step_4(word, rv):
+    if word.endswith('нн') and len(word) - 2 >= rv:
+        return word[:-1]
+    word, removed = _strip(word, rv, SUPERLATIVE_ENDINGS)
+    if removed:
+        if word.endswith('нн') and len(word) - 2 >= rv:
+            word = word[:-1]
+        return word
+    word, _ = _strip(word, rv, ('ь',))
+    return word
+
+
+@lru_cache(maxsize=STEM_CACHE_SIZE)
+def stem(word):
+    word = word.lower().replace('ё', 'е')
+    if not CYRILLIC.match(word):
+        return word
+    rv, _, r2 = _regions(word)
+    word = _step_1(word, rv)
+    word, _ = _strip(word, rv, ('и',))
+    word, _ = _strip(word, r2, DERIVATIONAL_ENDINGS)
+    return _step_4(word, rv)
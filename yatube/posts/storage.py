@@ -0,0 +1,144 @@
+import hashlib
+import os
+import posixpath
+import tempfile
+
+from django.apps import apps
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.utils.deconstruct import deconstructible
+
+from .counters import shifted
+
+HASH_NAME = 'sha256'
+# Два уровня по два символа хэша: не больше 256 файлов в каталоге
+# на каждом уровне, пока блобов меньше нескольких миллионов.
+SHARD_LEVELS = 2
+SHARD_WIDTH = 2
+
+
+def _current_umask():
+    # Узнать umask можно только сменив его; читаем один раз при импорте,
+    # пока потоков сервера ещё нет.
+    mask = os.umask(0)
+    os.umask(mask)
+    return mask
+
+
+UMASK = _current_umask()
+
+
+def blob_name(directory, digest, extension):
+    shards = [
+        digest[level * SHARD_WIDTH:(level + 1) * SHARD_WIDTH]
+        for level in range(SHARD_LEVELS)
+    ]
+    return posixpath.join(directory, *shards, digest + extension)
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Файлы под именем, равным хэшу содержимого.
+
+    Загрузка хэшируется по мере записи во временный файл рядом
+    с хранилищем; одинаковое содержимое ложится в один и тот же файл
+    posts/ab/cd/abcd....jpg, и второй раз на диск не пишется. Превью
+    sorl привязаны к имени файла, поэтому для копий тоже не строятся.
+    Ссылку на файл берёт сам _save() в одной транзакции с проверкой:
+    release() другого процесса не удалит файл, пока пост ещё не сохранён,
+    а удалённый ею до этого файл запишется заново. Удалять файлы можно
+    только через release(), когда на них больше не ссылается ни один пост.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        return name
+
+    def _save(self, name, content):
+        directory = posixpath.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        os.makedirs(self.path(directory), exist_ok=True)
+        digest = hashlib.new(HASH_NAME)
+        descriptor, temporary = tempfile.mkstemp(
+            dir=self.path(directory), prefix='.upload-'
+        )
+        try:
+            with os.fdopen(descriptor, 'wb') as target:
+                if hasattr(content, 'seek'):
+                    content.seek(0)
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    target.write(chunk)
+            name = blob_name(directory, digest.hexdigest(), extension)
+            path = self.path(name)
+            if self._take_ref(name) and os.path.exists(path):
+                return name
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # mkstemp создаёт файл с правами 0600: веб-сервер, отдающий
+            # media, его бы не прочитал.
+            os.chmod(temporary, (
+                self.file_permissions_mode
+                if self.file_permissions_mode is not None
+                else 0o666 & ~UMASK
+            ))
+            os.replace(temporary, path)
+            return name
+        finally:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+
+    @staticmethod
+    def _take_ref(name):
+        """Взять ссылку на файл; вернуть, были ли на него другие ссылки.
+
+        Транзакция записи ждёт удаления в release(), а после неё та уже
+        видит ссылку и файл не трогает.
+        """
+        ImageBlob = apps.get_model('posts', 'ImageBlob')
+        with transaction.atomic():
+            retain(name)
+            return ImageBlob.objects.get(name=name).refs > 1
+
+
+image_storage = ContentAddressedStorage()
+
+
+def retain(name, delta=1):
+    """Изменить число постов, ссылающихся на файл.
+
+    Для загруженных файлов ссылку уже взял _save(); сохранение, которое
+    так и не дошло до поста, оставит лишнюю ссылку до recount_images.
+    """
+    ImageBlob = apps.get_model('posts', 'ImageBlob')
+    if not name:
+        return
+    updated = ImageBlob.objects.filter(name=name).update(
+        refs=shifted('refs', delta)
+    )
+    if not updated and delta > 0:
+        ImageBlob.objects.get_or_create(name=name)
+        ImageBlob.objects.filter(name=name).update(refs=shifted('refs', delta))
+
+
+def delete_blob(name):
+    """Удалить файл вместе с превью sorl и их записями."""
+    from sorl.thumbnail import default
+    from sorl.thumbnail.images import ImageFile
+
+    default.kvstore.delete(ImageFile(name, image_storage))
+    image_storage.delete(name)
+
+
+def release(name):
+    """Убрать ссылку поста на файл; последняя удаляет его после коммита."""
+    ImageBlob = apps.get_model('posts', 'ImageBlob')
+    if not name:
+        return
+    retain(name, -1)
+
+    def delete_unused():
+        # Проверка и удаление файла в одной транзакции записи: загрузка
+        # того же содержимого в _save() дождётся её и запишет файл заново.
+        with transaction.atomic():
+            if ImageBlob.objects.filter(name=name, refs=0).delete()[0]:
+                delete_blob(name)
+    transaction.on_commit(delete_unused)
@@ -0,0 +1,48 @@
+from django import template
+from django.utils.html import format_html
+from django.utils.safestring import mark_safe
+
+from .. import cache
+from ..thumbnails import RENDITIONS
+
+register = template.Library()
+
+CARD_TEMPLATE = 'includes/article.html'
+
+
+@register.filter
+def rendition(post, name):
+    return post.rendition_url(name)
+
+
+@register.simple_tag
+def image_size(post, name):
+    """Атрибуты width и height картинки поста, если размер известен."""
+    if post.rendition_url(name):
+        width, height = RENDITIONS[name][0].split('x')
+    elif post.image_width and post.image_height:
+        width, height = post.image_width, post.image_height
+    else:
+        return ''
+    return format_html('width="{}" height="{}"', width, height)
+
+
+@register.simple_tag(takes_context=True)
+def post_cards(context, posts):
+    """Карточки постов страницы из кэша фрагментов."""
+    card = context.template.engine.get_template(CARD_TEMPLATE)
+    if context.get('profile'):
+        variant = 'profile'
+    elif context.get('group_list'):
+        variant = 'group'
+    else:
+        variant = 'feed'
+
+    def render(post):
+        with context.push(post=post):
+            return card.render(context)
+
+    return [
+        mark_safe(html)
+        for html in cache.render_cards(list(posts), variant, render)
+    ]
@@ -1,5 +1,8 @@
+import io
+import os
 import shutil
 import tempfile
+from unittest import mock
 
 from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
@@ -7,8 +10,12 @@ from django.test import Client, TestCase, override_settings
 from django.shortcuts import get_object_or_404
 from django.urls import reverse
 from django.conf import settings
+from PIL import Image
+from sorl.thumbnail import get_thumbnail
 
-from ..models import Post, Group, Comment
+from ..models import Post, Group, Comment, ImageBlob
+from ..storage import image_storage, release
+from ..thumbnails import build_renditions, process_image
 
 User = get_user_model()
 
@@ -178,3 +185,137 @@ class PostCreateFormTests(TestCase):
         for first_object, first_result in form_data_result:
             with self.subTest(first_object=first_object):
                 self.assertEqual(first_object, first_result)
+
+    def test_image_renditions_built_off_request(self):
+        """Проверка: превью строятся заранее и попадают в шаблон"""
+        uploaded = SimpleUploadedFile(
+            name='small_edit.gif',
+            content=self.small_gif,
+            content_type='image/gif'
+        )
+        Post.objects.filter(pk=self.post.pk).update(
+            image_renditions='{"card": "/media/old.jpg"}')
+        self.authorized_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': self.post.pk}),
+            data={'text': self.post.text, 'image': uploaded},
+        )
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.image_renditions, '')
+        urls = build_renditions(self.post.pk)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.rendition_url('card'), urls['card'])
+        response = self.authorized_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}))
+        self.assertContains(response, urls['card'])
+
+    def test_renditions_skipped_after_image_replaced(self):
+        """Проверка: превью заменённой картинки не сохраняются"""
+        Post.objects.filter(pk=self.post.pk).update(image_renditions='')
+
+        def replace_image(image, *args, **kwargs):
+            Post.objects.filter(pk=self.post.pk).update(image='posts/new.gif')
+            return get_thumbnail(image, *args, **kwargs)
+        with mock.patch('posts.thumbnails.get_thumbnail', replace_image):
+            self.assertIsNone(build_renditions(self.post.pk))
+        self.assertEqual(
+            Post.objects.get(pk=self.post.pk).image_renditions, '')
+
+    def test_identical_uploads_share_blob(self):
+        """Проверка: одинаковые картинки хранятся одним файлом со счётчиком"""
+        uploaded = SimpleUploadedFile(
+            name='repost.GIF',
+            content=self.small_gif,
+            content_type='image/gif'
+        )
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Репост', 'image': uploaded},
+        )
+        repost = Post.objects.get(text='Репост')
+        name = self.post.image.name
+        self.assertEqual(repost.image.name, name)
+        self.assertEqual(len(os.listdir(os.path.dirname(
+            self.post.image.path))), 1)
+        self.assertEqual(ImageBlob.objects.get(name=name).refs, 2)
+        with mock.patch('posts.storage.transaction.on_commit',
+                        lambda callback: callback()):
+            repost.delete()
+            self.assertTrue(os.path.exists(self.post.image.path))
+            Post.objects.get(pk=self.post.pk).delete()
+        self.assertFalse(os.path.exists(self.post.image.path))
+        self.assertFalse(ImageBlob.objects.filter(name=name).exists())
+
+    def test_blob_readable_and_rewritten_without_refs(self):
+        """Проверка: файл картинки доступен на чтение и пишется заново,
+        если release() уже удаляет его запись"""
+        name = self.post.image.name
+        path = self.post.image.path
+        self.assertEqual(os.stat(path).st_mode & 0o444, 0o444)
+        ImageBlob.objects.filter(name=name).update(refs=0)
+        release(name)
+        self.assertEqual(ImageBlob.objects.get(name=name).refs, 0)
+        ImageBlob.objects.filter(name=name).delete()
+        inode = os.stat(path).st_ino
+        uploaded = SimpleUploadedFile(
+            name='again.gif',
+            content=self.small_gif,
+            content_type='image/gif'
+        )
+        self.assertEqual(
+            self.post.image.storage.save('posts/again.gif', uploaded), name)
+        self.assertNotEqual(os.stat(path).st_ino, inode)
+        self.assertEqual(os.stat(path).st_mode & 0o444, 0o444)
+        self.assertEqual(ImageBlob.objects.get(name=name).refs, 1)
+
+    def test_upload_during_release_keeps_blob(self):
+        """Проверка: удаление из release() между записью файла
+        и сохранением поста не трогает файл"""
+        name = self.post.image.name
+        callbacks = []
+        with mock.patch('posts.storage.transaction.on_commit',
+                        callbacks.append):
+            Post.objects.get(pk=self.post.pk).delete()
+        save = image_storage._save
+
+        def save_then_release(*args):
+            saved = save(*args)
+            for callback in callbacks:
+                callback()
+            return saved
+        uploaded = SimpleUploadedFile(
+            name='again.gif',
+            content=self.small_gif,
+            content_type='image/gif'
+        )
+        with mock.patch.object(image_storage, '_save', save_then_release):
+            repost = Post.objects.create(
+                text='Репост', author=self.user, image=uploaded)
+        self.assertEqual(repost.image.name, name)
+        self.assertTrue(os.path.exists(repost.image.path))
+        self.assertEqual(ImageBlob.objects.get(name=name).refs, 1)
+
+    @override_settings(IMAGE_MAX_SIDE=64)
+    def test_uploaded_image_normalized(self):
+        """Проверка: картинка повёрнута по EXIF, уменьшена и пережата"""
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        buffer = io.BytesIO()
+        Image.new('RGB', (300, 100), 'red').save(
+            buffer, 'PNG', exif=exif.tobytes())
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Большая картинка', 'image': SimpleUploadedFile(
+                'photo.png', buffer.getvalue(), content_type='image/png')},
+        )
+        post = Post.objects.get(text='Большая картинка')
+        process_image(post.pk)
+        post.refresh_from_db()
+        self.assertTrue(post.image.name.endswith('.jpg'))
+        self.assertEqual((post.image_width, post.image_height), (21, 64))
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.size, (21, 64))
+            self.assertTrue(image.info.get('progressive'))
+            self.assertNotIn('exif', image.info)
+        response = self.authorized_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': post.pk}))
+        self.assertContains(response, 'width="960" height="339"')
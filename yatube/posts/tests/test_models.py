@@ -1,7 +1,14 @@
+from io import StringIO
+
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError, transaction
 from django.test import TestCase
+from django.urls import reverse
 
-from ..models import Group, Post, Comment, Follow
+from ..graph import graph
+from ..models import Group, Post, Comment, Follow, Profile
 
 User = get_user_model()
 
@@ -119,6 +126,11 @@ class PostModelTest(TestCase):
                     expected_value
                 )
 
+    def test_follow_unique(self):
+        """Проверка: повторная подписка запрещена на уровне БД"""
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Follow.objects.create(user=self.user, author=self.user)
+
     def test_comment_verbose_name(self):
         """Проверка атрибуты verbose_name для модели Comment"""
         field_verboses = [
@@ -145,4 +157,143 @@ class PostModelTest(TestCase):
                 self.assertEqual(
                     self.comment._meta.get_field(field).help_text,
                     expected_value
-                )
\ No newline at end of file
+                )
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+
+    def counters(self):
+        self.group.refresh_from_db()
+        return (
+            Profile.objects.get(user=self.author).posts_count,
+            self.group.posts_count,
+            Profile.objects.get(user=self.author).followers_count,
+            Profile.objects.get(user=self.user).following_count,
+        )
+
+    def test_counters_follow_writes(self):
+        """Проверка счётчиков при создании и удалении объектов"""
+        post = Post.objects.create(
+            text='Тестовый пост', group=self.group, author=self.author)
+        follow = Follow.objects.create(user=self.user, author=self.author)
+        Comment.objects.create(post=post, author=self.user, text='Текст')
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(self.counters(), (1, 1, 1, 1))
+        follow.delete()
+        post.delete()
+        self.assertEqual(self.counters(), (0, 0, 0, 0))
+
+    def test_delete_after_counter_drift(self):
+        """Проверка: отставший счётчик не опускается ниже нуля"""
+        post = Post.objects.create(
+            text='Тестовый пост', group=self.group, author=self.author)
+        Profile.objects.filter(user=self.author).update(posts_count=0)
+        Group.objects.filter(pk=self.group.pk).update(posts_count=0)
+        post.delete()
+        self.assertEqual(self.counters()[:2], (0, 0))
+
+    def test_recount_command_fixes_drift(self):
+        """Проверка команды recount"""
+        Post.objects.bulk_create([
+            Post(text='Тестовый пост', group=self.group, author=self.author)
+            for _ in range(3)
+        ])
+        Follow.objects.bulk_create(
+            [Follow(user=self.user, author=self.author)])
+        Profile.objects.filter(user=self.user).delete()
+        call_command('recount', stdout=StringIO())
+        self.assertEqual(self.counters(), (3, 3, 1, 1))
+
+
+class FollowGraphTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='graph_user')
+        cls.authors = [
+            User.objects.create_user(username=f'graph_author_{index}')
+            for index in range(3)
+        ]
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_graph_answers_without_queries(self):
+        """Проверка графа подписок: ответы из памяти, правка сигналами"""
+        first, second, third = (author.pk for author in self.authors)
+        Follow.objects.create(user=self.user, author=self.authors[0])
+        self.assertTrue(graph.is_following(self.user.pk, first))
+        self.assertEqual(graph.followers_count(third), 0)
+        Follow.objects.create(user=self.user, author=self.authors[2])
+        Follow.objects.filter(
+            user=self.user, author=self.authors[0]).delete()
+        with self.assertNumQueries(0):
+            self.assertFalse(graph.is_following(self.user.pk, first))
+            self.assertEqual(
+                graph.following_many(self.user.pk, [first, second, third]),
+                {third}
+            )
+            self.assertEqual(graph.following_count(self.user.pk), 1)
+            self.assertEqual(graph.followers_count(third), 1)
+            self.assertFalse(graph.is_following(None, third))
+
+    def test_graph_reloads_after_invalidate(self):
+        """Проверка перечитывания графа после массовой загрузки"""
+        author = self.authors[1]
+        self.assertFalse(graph.is_following(self.user.pk, author.pk))
+        Follow.objects.bulk_create([Follow(user=self.user, author=author)])
+        graph.invalidate()
+        self.assertTrue(graph.is_following(self.user.pk, author.pk))
+
+
+class RenderedTextTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(
+            text='<b>Первая</b> строка\nвторая строка поста подлиннее',
+            author=cls.user,
+        )
+
+    def test_text_rendered_on_save(self):
+        """Проверка: HTML, заголовок и выдержка готовы после сохранения"""
+        self.assertEqual(
+            self.post.text_html,
+            '&lt;b&gt;Первая&lt;/b&gt; строка<br>'
+            'вторая строка поста подлиннее'
+        )
+        self.assertEqual(self.post.title, '<b>Первая</b> строка\nвторая с…')
+        self.assertEqual(
+            self.post.excerpt,
+            '<b>Первая</b> строка вторая строка поста подлиннее'
+        )
+        response = self.client.get(
+            reverse('posts:post_detail', args=(self.post.pk,)))
+        self.assertContains(response, self.post.text_html)
+        self.assertContains(
+            response, '<meta name="description" content="&lt;b&gt;')
+
+    def test_update_and_backfill(self):
+        """Проверка update по тексту и команды backfill_post_text"""
+        Post.objects.filter(pk=self.post.pk).update(text='Новый\nтекст')
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.text_html, 'Новый<br>текст')
+        Post.objects.update(text_html='', title='', excerpt='')
+        call_command('backfill_post_text', stdout=StringIO())
+        self.post.refresh_from_db()
+        self.assertEqual(
+            (self.post.text_html, self.post.title, self.post.excerpt),
+            ('Новый<br>текст', 'Новый\nтекст', 'Новый текст')
+        )
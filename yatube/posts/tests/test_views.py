@@ -1,5 +1,11 @@
+import csv
+import json
+import os
+import re
 import tempfile
 import shutil
+from io import StringIO
+from unittest import mock
 
 from django.contrib.auth import get_user_model
 from django.test import Client, TestCase, override_settings
@@ -7,14 +13,26 @@ from django.urls import reverse
 from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.core.cache import cache
+from django.core.management import call_command
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.utils import timezone
 
 
-from ..models import Post, Group, Follow
+from ..models import (
+    Post, Group, Follow, FeedEntry, Comment, ImageBlob, ImportCheckpoint,
+    Profile, Recommendation
+)
 from ..forms import PostForm
+from .. import cache as posts_cache, feed, importer, search, timeline
+from ..cards import PostCard
+from ..paginators import CursorPaginator
+from ..rendering import render_text
 
 User = get_user_model()
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+CURSOR = re.compile(rb'cursor=[^"]+')
 
 
 @override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
@@ -130,10 +148,7 @@ class PostPagesTests(TestCase):
     def test_cache(self):
         """Проверка кэша"""
         response = self.authorized_client.get(reverse('posts:index'))
-        Post.objects.create(
-            text='Новый тестовый пост',
-            author=self.user,
-        )
+        Post.objects.filter(pk=self.post.pk).update(text='Изменённый пост')
         content_second = self.authorized_client.get(reverse('posts:index')
                                                     ).content
         self.assertEqual(
@@ -146,6 +161,77 @@ class PostPagesTests(TestCase):
             self.authorized_client.get(reverse('posts:index')).content
         )
 
+    def test_replica_page_not_cached(self):
+        """Проверка: страница, прочитанная из реплики, не кэшируется"""
+        with mock.patch('posts.cache.routers.read_replica',
+                        return_value=True):
+            self.authorized_client.get(reverse('posts:index'))
+        Post.objects.filter(pk=self.post.pk).update(
+            text='Изменённый пост', **render_text('Изменённый пост'),
+            updated=timezone.now())
+        self.assertContains(
+            self.authorized_client.get(reverse('posts:index')),
+            'Изменённый пост'
+        )
+
+    def test_cache_invalidated_on_write(self):
+        """Проверка сброса кэша страниц при создании поста"""
+        for reverse_url in self.template_post:
+            with self.subTest(reverse_url=reverse_url):
+                content = self.authorized_client.get(reverse_url).content
+                post = Post.objects.create(
+                    text='Новый тестовый пост',
+                    group=self.group,
+                    author=self.user,
+                )
+                content_second = self.authorized_client.get(
+                    reverse_url).content
+                self.assertNotEqual(content, content_second)
+                self.assertIn(post.text.encode(), content_second)
+                post.delete()
+
+    def test_cache_serves_stale_page_while_locked(self):
+        """Проверка: пока страницу пересчитывает другой запрос,
+        отдаётся устаревшая копия"""
+        content = self.authorized_client.get(reverse('posts:index')).content
+        post = Post.objects.create(
+            text='Новый тестовый пост',
+            author=self.user,
+        )
+        with mock.patch.object(cache, 'add', return_value=False):
+            content_locked = self.authorized_client.get(
+                reverse('posts:index')).content
+        self.assertEqual(content, content_locked)
+        self.assertIn(
+            post.text.encode(),
+            self.authorized_client.get(reverse('posts:index')).content
+        )
+
+    def test_post_cards_cached(self):
+        """Проверка кэша карточек: правка поста меняет ключ карточки"""
+        post = Post.objects.get(pk=self.post.pk)
+        self.guest_client.get(reverse('posts:index'))
+        Post.objects.filter(pk=post.pk).update(text='Текст мимо кэша')
+        posts_cache.bump('index')
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertContains(response, post.text)
+        self.assertNotContains(response, 'Текст мимо кэша')
+        post.text = 'Исправленный текст'
+        post.save()
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertContains(response, 'Исправленный текст')
+
+    def test_post_cards_variants(self):
+        """Проверка: карточки разных страниц кэшируются отдельно"""
+        self.assertContains(
+            self.guest_client.get(reverse('posts:index')),
+            'все записи группы'
+        )
+        for url, text in zip(self.template_group_profile,
+                             ('все записи группы', 'все посты пользователя')):
+            with self.subTest(url=url):
+                self.assertNotContains(self.guest_client.get(url), text)
+
 
 class PostPaginatorViewsTest(TestCase):
     @classmethod
@@ -209,6 +295,71 @@ class PostPaginatorViewsTest(TestCase):
                 response = self.client.get(reverse_name + f'?page={page}')
                 self.assertEqual(len(response.context['page_obj']), page_obj)
 
+    def test_cursor_pages_cover_all_records(self):
+        """Проверка keyset-пагинации: вперёд и назад без пропусков"""
+        for reverse_name in self.temlate_name:
+            with self.subTest(reverse_name=reverse_name):
+                seen = []
+                response = self.client.get(reverse_name + '?cursor=')
+                pages = [response.context['page_obj']]
+                while pages[-1].has_next():
+                    response = self.client.get(
+                        reverse_name, {'cursor': pages[-1].next_cursor})
+                    pages.append(response.context['page_obj'])
+                for page in pages:
+                    seen.extend(post.pk for post in page)
+                self.assertEqual(len(seen), self.NUMBER_OF_POST)
+                self.assertEqual(len(set(seen)), self.NUMBER_OF_POST)
+                response = self.client.get(
+                    reverse_name, {'cursor': pages[-1].previous_cursor})
+                self.assertEqual(
+                    [post.pk for post in response.context['page_obj']],
+                    [post.pk for post in pages[-2]]
+                )
+
+
+class CommentPaginationViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(text='Тестовый пост', author=cls.user)
+        cls.NUMBER_OF_COMMENTS = settings.QUANTITY_COMMENTS + 5
+        Comment.objects.bulk_create([
+            Comment(post=cls.post, author=cls.user, text=f'Комментарий {i}')
+            for i in range(cls.NUMBER_OF_COMMENTS)
+        ])
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_comments_paginated(self):
+        """Проверка постраничной подгрузки комментариев"""
+        response = self.authorized_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}))
+        comments = response.context['comments']
+        self.assertEqual(len(comments), settings.QUANTITY_COMMENTS)
+        response = self.client.get(
+            reverse('posts:post_comments', kwargs={'post_id': self.post.id}),
+            {'cursor': comments.next_cursor}
+        )
+        self.assertTemplateUsed(response, 'includes/comment_list.html')
+        rest = response.context['comments']
+        self.assertEqual(
+            len(rest), self.NUMBER_OF_COMMENTS - settings.QUANTITY_COMMENTS)
+        self.assertFalse(rest.has_next())
+        self.assertFalse(
+            {comment.pk for comment in comments}
+            & {comment.pk for comment in rest}
+        )
+
+    def test_comments_fragment_queries(self):
+        """Проверка: авторы комментариев берутся тем же запросом"""
+        with self.assertNumQueries(1):
+            self.client.get(reverse(
+                'posts:post_comments', kwargs={'post_id': self.post.id}))
+
 
 class FollowTestsPosts(TestCase):
     @classmethod
@@ -313,3 +464,534 @@ class FollowTestsPosts(TestCase):
         )
         self.assertNotEqual(response.context['page_obj'][0].id,
                             self.first_post.id)
+
+    def test_follow_feed_materialized_on_write(self):
+        """Проверка раскладки новых постов по лентам подписчиков"""
+        Follow.objects.create(user=self.first_user, author=self.first_author)
+        self.assertTrue(FeedEntry.objects.filter(
+            user=self.first_user, post=self.first_post).exists())
+        new_post = Post.objects.create(
+            author=self.first_author, text='Новый пост')
+        response = self.first_authorized_client.get(
+            reverse('posts:follow_index'))
+        self.assertEqual(response.context['page_obj'][0].id, new_post.id)
+        Follow.objects.filter(
+            user=self.first_user, author=self.first_author).delete()
+        self.assertFalse(
+            FeedEntry.objects.filter(user=self.first_user).exists())
+
+    @override_settings(FEED_FANOUT_LIMIT=0)
+    def test_follow_feed_celebrity_read_on_request(self):
+        """Проверка: посты знаменитостей читаются без раскладки"""
+        Follow.objects.create(user=self.first_user, author=self.first_author)
+        self.assertFalse(
+            FeedEntry.objects.filter(user=self.first_user).exists())
+        response = self.first_authorized_client.get(
+            reverse('posts:follow_index'))
+        self.assertEqual(response.context['page_obj'][0].id,
+                         self.first_post.id)
+
+    def test_repair_feed_command(self):
+        """Проверка команды repair_feed"""
+        Follow.objects.create(user=self.first_user, author=self.first_author)
+        FeedEntry.objects.all().delete()
+        FeedEntry.objects.create(user=self.first_user, post=self.second_post)
+        call_command('repair_feed', stdout=StringIO())
+        self.assertEqual(
+            list(FeedEntry.objects.filter(
+                user=self.first_user).values_list('post_id', flat=True)),
+            [self.first_post.id]
+        )
+
+
+@override_settings(FEED_FANOUT_LIMIT=0)
+class FollowTimelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='timeline_reader')
+        cls.authors = [
+            User.objects.create_user(username=f'timeline_{index}')
+            for index in range(3)
+        ]
+        for index in range(15):
+            Post.objects.create(
+                author=cls.authors[index % 3], text=f'Пост {index}')
+        for author in cls.authors:
+            Follow.objects.create(user=cls.reader, author=author)
+
+    def setUp(self):
+        self.client.force_login(self.reader)
+
+    def tearDown(self):
+        cache.clear()
+
+    def walk(self):
+        ids, params = [], {}
+        while True:
+            page = self.client.get(
+                reverse('posts:follow_index'), params).context['page_obj']
+            ids += [post.pk for post in page]
+            if not page.has_next():
+                return ids
+            params = {'cursor': page.next_cursor}
+
+    def expected(self):
+        return list(Post.objects.filter(
+            author__following__user=self.reader
+        ).order_by('-pub_date', '-pk').values_list('pk', flat=True))
+
+    def test_merged_feed_matches_orm(self):
+        """Проверка: слияние буферов авторов даёт ту же ленту, что ORM"""
+        for size in (100, 2):
+            with self.subTest(size=size), \
+                    override_settings(FEED_RECENT_POSTS=size):
+                cache.clear()
+                self.assertEqual(self.walk(), self.expected())
+
+    def test_next_cursor_pages_merged(self):
+        """Проверка: страницы по курсору строит слияние, а не ORM"""
+        self.walk()
+        with mock.patch.object(
+            CursorPaginator, 'get_page', side_effect=AssertionError
+        ):
+            self.assertEqual(self.walk(), self.expected())
+
+    def test_recent_buffers_follow_signals(self):
+        """Проверка обновления буферов и подписок сигналами"""
+        self.walk()
+        author = self.authors[0]
+        with mock.patch('posts.timeline.transaction.on_commit',
+                        lambda callback: callback()):
+            new_post = Post.objects.create(author=author, text='Новый пост')
+        self.assertEqual(
+            timeline.recent_posts([author.pk])[author.pk][0],
+            timeline.entry(new_post.pub_date, new_post.pk))
+        self.assertEqual(self.walk()[0], new_post.pk)
+        new_post.delete()
+        Follow.objects.filter(
+            user=self.reader, author=self.authors[1]).delete()
+        self.assertEqual(self.walk(), self.expected())
+
+    @override_settings(FEED_FANOUT_LIMIT=5000, CURSOR_PAGINATION=True)
+    def test_materialized_feed_skips_merge(self):
+        """Проверка: без знаменитостей лента читается из FeedEntry"""
+        feed.rebuild(self.reader.pk)
+        with mock.patch('posts.views.TimelinePaginator',
+                        side_effect=AssertionError):
+            self.assertEqual(self.walk(), self.expected())
+
+
+class RecommendationsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.users = {
+            name: User.objects.create_user(username=f'rec_{name}')
+            for name in ('reader', 'first', 'second', 'popular', 'rare')
+        }
+        for user, author in (
+            ('reader', 'first'), ('reader', 'second'),
+            ('first', 'popular'), ('second', 'popular'), ('second', 'rare'),
+        ):
+            Follow.objects.create(
+                user=cls.users[user], author=cls.users[author])
+
+    def setUp(self):
+        self.client.force_login(self.users['reader'])
+
+    def tearDown(self):
+        cache.clear()
+
+    def suggested(self):
+        return list(Recommendation.objects.filter(
+            user=self.users['reader']
+        ).values_list('author__username', 'overlap'))
+
+    def test_recommendations_refresh_and_panel(self):
+        """Проверка расчёта рекомендаций и блока «Кого почитать»"""
+        for options in ({}, {'full': True}):
+            with self.subTest(options=options):
+                call_command('recommend_authors', stdout=StringIO(),
+                             **options)
+                self.assertEqual(
+                    self.suggested(), [('rec_popular', 2), ('rec_rare', 1)])
+        response = self.client.get(
+            reverse('posts:profile', args=('rec_reader',)))
+        self.assertContains(response, 'Кого почитать')
+        self.assertContains(response, 'rec_popular')
+        response = self.client.get(
+            reverse('posts:profile', args=('rec_first',)))
+        self.assertNotContains(response, 'Кого почитать')
+        self.client.get(
+            reverse('posts:profile_follow', args=('rec_popular',)))
+        self.assertEqual(self.suggested(), [('rec_rare', 1)])
+        self.assertTrue(Profile.objects.get(
+            user=self.users['reader']).recommendations_stale)
+        response = self.client.get(
+            reverse('posts:profile', args=('rec_reader',)))
+        self.assertNotContains(response, 'rec_popular')
+
+    def test_incremental_refresh_reaches_followers(self):
+        """Проверка: подписка отмечает только читателя и автора,
+        а пересчёт доходит и до подписчиков читателя"""
+        call_command('recommend_authors', full=True, stdout=StringIO())
+        Follow.objects.create(
+            user=self.users['first'], author=self.users['rare'])
+        self.assertEqual(
+            set(Profile.objects.filter(
+                recommendations_stale=True).values_list(
+                    'user__username', flat=True)),
+            {'rec_first', 'rec_rare'})
+        call_command('recommend_authors', stdout=StringIO())
+        self.assertCountEqual(
+            self.suggested(), [('rec_popular', 2), ('rec_rare', 2)])
+
+
+class SearchViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.matching = [
+            Post.objects.create(
+                author=cls.user, text=f'Оформление подписки номер {index}')
+            for index in range(3)
+        ]
+        cls.other = Post.objects.create(
+            author=cls.user, text='Совсем другая тема')
+
+    def setUp(self):
+        self.client = Client()
+
+    def test_search_matches_word_forms(self):
+        """Проверка: поиск находит другие формы слова"""
+        response = self.client.get(
+            reverse('posts:search'), {'q': 'подписками'})
+        self.assertEqual(
+            {post.id for post in response.context['posts']},
+            {post.id for post in self.matching}
+        )
+
+    def test_search_cursor_pagination(self):
+        """Проверка постраничного вывода результатов по курсору"""
+        seen = []
+        cursor = None
+        while True:
+            posts, cursor = search.search_posts('подписка', cursor, limit=2)
+            seen += [post.id for post in posts]
+            if cursor is None:
+                break
+        self.assertCountEqual(seen, [post.id for post in self.matching])
+
+    def test_search_index_follows_changes(self):
+        """Проверка обновления индекса при правке и удалении поста"""
+        self.other.text = 'Теперь и здесь про подписку'
+        self.other.save()
+        posts, _ = search.search_posts('подписка')
+        self.assertIn(self.other, posts)
+        self.other.delete()
+        posts, _ = search.search_posts('подписка')
+        self.assertNotIn(self.other, posts)
+
+    def test_inverted_index_backend(self):
+        """Проверка индекса в памяти для БД без FTS5"""
+        backend = search.InvertedIndexBackend()
+        terms = search.tokenize('подписки')
+        first = backend.search(terms, limit=2)
+        self.assertEqual(len(first), 2)
+        rest = backend.search(terms, after=first[-1], limit=10)
+        self.assertCountEqual(
+            [post_id for _, post_id in first + rest],
+            [post.id for post in self.matching]
+        )
+        backend.remove(self.matching[0].id)
+        self.assertEqual(len(backend.search(terms, limit=10)), 2)
+
+
+class FakeDataBenchmarkTest(TestCase):
+    def test_generate_fake_data_and_bench_views(self):
+        """Проверка генератора данных и замеров страниц"""
+        cache.clear()
+        self.client.get(reverse('posts:index'))
+        call_command(
+            'generate_fake_data', users=20, groups=2, posts=60,
+            comments=30, follows=3, seed=1, stdout=StringIO()
+        )
+        self.assertEqual(User.objects.count(), 20)
+        self.assertEqual(Post.objects.count(), 60)
+        self.assertEqual(Comment.objects.count(), 30)
+        self.assertGreater(
+            len(set(Post.objects.values_list('pub_date', flat=True))), 1
+        )
+        latest = Post.objects.order_by('-pub_date', '-pk').first()
+        self.assertContains(self.client.get(reverse('posts:index')),
+                            reverse('posts:post_detail', args=[latest.pk]))
+        follow = Follow.objects.first()
+        self.assertEqual(
+            FeedEntry.objects.filter(user=follow.user).count(),
+            Post.objects.filter(author__following__user=follow.user).count()
+        )
+        output_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, output_dir, ignore_errors=True)
+        out = StringIO()
+        call_command('bench_views', repeat=1, output_dir=output_dir,
+                     stdout=out)
+        self.assertIn('follow_index', out.getvalue())
+        self.assertEqual(len(os.listdir(output_dir)), 1)
+        out = StringIO()
+        call_command('bench_cards', sizes=[10], repeat=1, stdout=out)
+        self.assertIn('cards', out.getvalue())
+        out = StringIO()
+        call_command('bench_follow_feed', follows=[3, 30], repeat=1,
+                     stdout=out)
+        self.assertIn('merge warm', out.getvalue())
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='writer')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='conditional', description='Описание'
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Пост')
+        cls.urls = [
+            reverse('posts:post_detail', args=(cls.post.pk,)),
+            reverse('posts:profile', args=(cls.author.username,)),
+            reverse('posts:group_list', args=(cls.group.slug,)),
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def revalidate(self, url, response):
+        return self.client.get(
+            url, HTTP_IF_NONE_MATCH=response['ETag']).status_code
+
+    def test_not_modified(self):
+        """Проверка: неизменившаяся страница отдаёт 304 за один запрос"""
+        guest_client = Client()
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = guest_client.get(url)
+                self.assertFalse(response.has_header('Last-Modified'))
+                with self.assertNumQueries(1):
+                    self.assertEqual(guest_client.get(
+                        url, HTTP_IF_NONE_MATCH=response['ETag']
+                    ).status_code, 304)
+                self.assertEqual(self.revalidate(url, response), 200)
+
+    def test_modified_after_post_edit(self):
+        """Проверка: правка поста меняет ETag всех трёх страниц"""
+        responses = [self.client.get(url) for url in self.urls]
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Исправленный пост'
+        post.save()
+        for url, response in zip(self.urls, responses):
+            with self.subTest(url=url):
+                self.assertEqual(self.revalidate(url, response), 200)
+
+    def test_modified_after_comment_and_follow(self):
+        """Проверка: комментарий и подписка меняют свои страницы"""
+        detail, profile = self.urls[:2]
+        responses = [self.client.get(detail), self.client.get(profile)]
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='Комментарий')
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(self.revalidate(detail, responses[0]), 200)
+        self.assertEqual(self.revalidate(profile, responses[1]), 200)
+
+    def test_if_modified_since_ignored(self):
+        """Проверка: переименование группы не даёт 304 по одной дате"""
+        url = self.urls[2]
+        self.client.get(url)
+        Group.objects.filter(pk=self.group.pk).update(title='Новое имя')
+        response = self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE='Fri, 01 Jan 2100 00:00:00 GMT')
+        self.assertEqual(response.status_code, 200)
+
+
+@override_settings(EXPORT_BATCH_SIZE=2)
+class ExportViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='exporter')
+        cls.posts = [
+            Post.objects.create(author=cls.author, text=f'Пост {index}')
+            for index in range(5)
+        ]
+        cls.comment = Comment.objects.create(
+            post=cls.posts[2], author=cls.author, text='Комментарий')
+        cls.url = reverse('posts:export_profile', args=('exporter',))
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def test_export_ndjson(self):
+        """Проверка потоковой выгрузки постов с комментариями"""
+        response = self.client.get(self.url)
+        self.assertTrue(response.streaming)
+        records = [
+            json.loads(line) for line in b''.join(
+                response.streaming_content).decode().splitlines()
+        ]
+        self.assertEqual(
+            [(record['type'], record['id']) for record in records],
+            [('post', post.id) for post in self.posts[:3]]
+            + [('comment', self.comment.id)]
+            + [('post', post.id) for post in self.posts[3:]]
+        )
+
+    def test_export_csv_and_command(self):
+        """Проверка выгрузки в CSV через страницу и команду"""
+        response = self.client.get(self.url, {'format': 'csv'})
+        content = b''.join(response.streaming_content).decode()
+        self.assertEqual(len(list(csv.reader(StringIO(content)))), 7)
+        out = StringIO()
+        call_command('export_posts', author='exporter', format='csv',
+                     stdout=out)
+        self.assertEqual(out.getvalue(), content)
+
+    def test_export_requires_login_and_known_format(self):
+        """Проверка доступа и формата выгрузки"""
+        self.assertEqual(Client().get(self.url).status_code, 302)
+        self.assertEqual(
+            self.client.get(self.url, {'format': 'xml'}).status_code, 404)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImportPostsTest(TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.images = os.path.join(directory, 'images')
+        os.mkdir(self.images)
+        with open(os.path.join(self.images, 'cat.gif'), 'wb') as image:
+            image.write(
+                b'\x47\x49\x46\x38\x39\x61\x02\x00'
+                b'\x01\x00\x80\x00\x00\x00\x00\x00'
+                b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+                b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+                b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+                b'\x0A\x00\x3B'
+            )
+        self.source = os.path.join(directory, 'dump.ndjson')
+        records = [
+            {'type': 'group', 'slug': 'imported', 'title': 'Импорт',
+             'description': 'Описание'},
+            {'type': 'post', 'id': 10, 'author': 'writer',
+             'group': 'imported', 'text': 'Первый перенесённый пост',
+             'pub_date': '2020-01-02T03:04:05+00:00',
+             'image': 'posts/cat.gif'},
+            {'type': 'comment', 'id': 1, 'post_id': 10,
+             'author': 'reader', 'text': 'Комментарий'},
+            {'type': 'post', 'id': 11, 'author': 'writer',
+             'text': 'Второй пост'},
+            {'type': 'follow', 'user': 'reader', 'author': 'writer'},
+        ]
+        with open(self.source, 'w', encoding='utf-8') as dump:
+            dump.writelines(
+                json.dumps(record, ensure_ascii=False) + '\n'
+                for record in records
+            )
+
+    def test_import_posts(self):
+        """Проверка массовой загрузки и пересчёта производных данных"""
+        call_command('import_posts', self.source, images=self.images,
+                     batch_size=2, stdout=StringIO())
+        first = Post.objects.get(text='Первый перенесённый пост')
+        self.assertEqual(first.group.slug, 'imported')
+        self.assertEqual(first.pub_date.year, 2020)
+        self.assertEqual(
+            ImageBlob.objects.get(name=first.image.name).refs, 1)
+        self.assertEqual(first.comments.get().author.username, 'reader')
+        self.assertEqual(first.comments_count, 1)
+        self.assertEqual(first.author.profile.posts_count, 2)
+        self.assertEqual(Group.objects.get(slug='imported').posts_count, 1)
+        self.assertEqual(
+            FeedEntry.objects.filter(user__username='reader').count(), 2)
+        self.assertEqual(
+            search.search_posts('перенесённые')[0], [first])
+
+    def test_import_resumes_from_checkpoint(self):
+        """Проверка: прерванная загрузка продолжается с целой пачки"""
+        load_posts = importer.Importer.load_posts
+        calls = []
+
+        def failing(loader, records):
+            calls.append(records)
+            if len(calls) > 1:
+                raise RuntimeError('Обрыв загрузки')
+            return load_posts(loader, records)
+
+        with mock.patch.object(importer.Importer, 'load_posts', failing):
+            with self.assertRaises(RuntimeError):
+                call_command('import_posts', self.source, batch_size=2,
+                             stdout=StringIO())
+        self.assertEqual(Post.objects.count(), 1)
+        self.assertEqual(
+            ImportCheckpoint.objects.get(
+                name=os.path.abspath(self.source)).position, 3)
+        for _ in range(2):
+            call_command('import_posts', self.source, batch_size=2,
+                         stdout=StringIO())
+            self.assertEqual(Post.objects.count(), 2)
+            self.assertEqual(Comment.objects.count(), 1)
+            self.assertEqual(Follow.objects.count(), 1)
+
+
+class FeedCardsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username='carder', first_name='Имя', last_name='Фамилия')
+        cls.reader = User.objects.create_user(username='card_reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='cards', description='Описание')
+        for index in range(12):
+            Post.objects.create(
+                author=cls.author, text=f'Пост {index}',
+                group=cls.group if index % 2 else None,
+                image='posts/card.jpg' if index == 3 else '',
+            )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list', args=('cards',)),
+            reverse('posts:profile', args=('carder',)),
+            reverse('posts:follow_index'),
+        ]
+
+    def render(self, url, params):
+        cache.clear()
+        client = Client()
+        client.force_login(self.reader)
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url, params)
+        return response, len(queries)
+
+    def test_card_records_render_same_pages(self):
+        """Проверка: PostCard и .only() рендерят одну и ту же страницу"""
+        for url in self.urls:
+            for params in ({}, {'cursor': ''}):
+                with self.subTest(url=url, params=params):
+                    models_page, models_queries = self.render(url, params)
+                    with override_settings(FEED_CARD_RECORDS=True):
+                        cards_page, cards_queries = self.render(url, params)
+                    self.assertIsInstance(
+                        cards_page.context['page_obj'][0], PostCard)
+                    # Курсоры подписаны с отметкой времени и могут
+                    # различаться, если рендеры пришлись на разные секунды.
+                    self.assertEqual(
+                        CURSOR.sub(b'cursor=', cards_page.content),
+                        CURSOR.sub(b'cursor=', models_page.content))
+                    self.assertEqual(cards_queries, models_queries)
@@ -0,0 +1,162 @@
+import io
+import json
+import logging
+import posixpath
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+from sorl.thumbnail import get_thumbnail
+
+from . import cache, storage
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+RENDITIONS = {
+    'card': ('960x339', {'crop': 'center', 'upscale': True}),
+}
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.THUMBNAIL_WORKERS,
+            thread_name_prefix='thumbnails'
+        )
+    return _executor
+
+
+def build_renditions(post_id):
+    """Построить все превью поста и сохранить их URL.
+
+    Если за время построения картинку поста заменили, превью старой
+    картинки не сохраняются.
+    """
+    post = Post.objects.select_related('author', 'group').filter(
+        pk=post_id
+    ).first()
+    if post is None or not post.image:
+        return None
+    urls = {
+        name: get_thumbnail(post.image, geometry, **options).url
+        for name, (geometry, options) in RENDITIONS.items()
+    }
+    saved = Post.objects.filter(pk=post_id, image=post.image.name).update(
+        image_renditions=json.dumps(urls), updated=timezone.now()
+    )
+    if not saved:
+        return None
+    cache.bump(*cache.post_scopes(post))
+    return urls
+
+
+def _is_normalized(image):
+    """Картинка уже в нужном виде: пережатие только потеряет качество."""
+    if max(image.size) > settings.IMAGE_MAX_SIDE or 'exif' in image.info:
+        return False
+    if image.format == 'WEBP':
+        return True
+    return image.format == 'JPEG' and bool(image.info.get('progressive'))
+
+
+def _encode(image):
+    """Пережать картинку; вернуть байты и расширение файла.
+
+    С прозрачностью пишется WebP, иначе формат IMAGE_FORMAT. EXIF,
+    XMP и комментарии не передаются кодировщику и пропадают,
+    ICC-профиль сохраняется, чтобы не исказить цвета.
+    """
+    options = {'quality': settings.IMAGE_QUALITY}
+    if image.info.get('icc_profile'):
+        options['icc_profile'] = image.info['icc_profile']
+    alpha = image.mode in ('RGBA', 'LA') or (
+        image.mode == 'P' and 'transparency' in image.info
+    )
+    if alpha or settings.IMAGE_FORMAT == 'WEBP':
+        image = image.convert('RGBA' if alpha else 'RGB')
+        options['method'] = 4
+        image_format, extension = 'WEBP', '.webp'
+    else:
+        image = image.convert('RGB')
+        options.update(progressive=True, optimize=True)
+        image_format, extension = 'JPEG', '.jpg'
+    buffer = io.BytesIO()
+    image.save(buffer, image_format, **options)
+    return buffer.getvalue(), extension
+
+
+def normalize_image(post_id):
+    """Повернуть по EXIF, уменьшить и пережать картинку поста.
+
+    Записывает ширину и высоту результата. Пост, у которого размеры
+    уже записаны, не трогается; если за время обработки картинку
+    поста заменили, результат не сохраняется.
+    """
+    post = Post.objects.filter(pk=post_id).first()
+    if post is None or not post.image or post.image_width:
+        return None
+    source = post.image.name
+    with post.image.open('rb') as original:
+        image = Image.open(original)
+        encoded = not (
+            getattr(image, 'is_animated', False) or _is_normalized(image)
+        )
+        name = source
+        if encoded:
+            image = ImageOps.exif_transpose(image)
+            image.thumbnail(
+                (settings.IMAGE_MAX_SIDE, settings.IMAGE_MAX_SIDE),
+                Image.LANCZOS
+            )
+            content, extension = _encode(image)
+            base = posixpath.splitext(source)[0]
+            name = post.image.storage.save(
+                base + extension, ContentFile(content)
+            )
+        width, height = image.size
+    changes = {'image_width': width, 'image_height': height}
+    if name != source:
+        changes.update(image=name, image_renditions='')
+    with transaction.atomic():
+        saved = Post.objects.filter(pk=post_id, image=source).update(
+            updated=timezone.now(), **changes
+        )
+        if encoded:
+            # Ссылку на новый файл взял storage.save(): отдаём старую,
+            # если пост перешёл на новый файл, иначе — только что взятую.
+            storage.release(
+                source if saved and name != source else name
+            )
+    return name if saved else None
+
+
+def process_image(post_id):
+    """Подготовить картинку поста и построить её превью."""
+    normalize_image(post_id)
+    return build_renditions(post_id)
+
+
+def _build_in_worker(post_id):
+    try:
+        process_image(post_id)
+    except Exception:
+        logger.exception('Не удалось построить превью поста %s', post_id)
+    finally:
+        connection.close()
+
+
+def schedule_renditions(post):
+    """Поставить обработку картинки в фоновый пул после коммита."""
+    if not post.image:
+        return
+    post_id = post.pk
+    transaction.on_commit(
+        lambda: get_executor().submit(_build_in_worker, post_id)
+    )
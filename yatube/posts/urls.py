@@ -9,6 +9,18 @@ urlpatterns = [
     path('group/<slug:slug>/', views.group_posts, name='group_list'),
     path('profile/<str:username>/', views.profile, name='profile'),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
+    path(
+        'posts/<int:post_id>/comments/',
+        views.post_comments,
+        name='post_comments'
+    ),
+    path('search/', views.post_search, name='search'),
+    path(
+        'profile/<str:username>/export/',
+        views.export_profile,
+        name='export_profile'
+    ),
+    path('group/<slug:slug>/export/', views.export_group, name='export_group'),
     path('create/', views.post_create, name='post_create'),
     path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit'),
     path(
@@ -2,21 +2,44 @@ from django.shortcuts import render, get_object_or_404, redirect
 from django.core.paginator import Paginator
 from django.conf import settings
 from django.contrib.auth.decorators import login_required
-from django.views.decorators.cache import cache_page
+from django.db import IntegrityError, transaction
+from django.http import Http404, StreamingHttpResponse
 
-
-from .models import Post, Group, User, Follow
+from .models import Post, Group, User, Follow, Comment, get_profile
 from .forms import PostForm, CommentForm
+from . import export, feed, recommendations, search
+from .cards import feed_posts
+from .graph import graph
+from .cache import cache_feed_page
+from .conditional import (
+    conditional_page, group_state, post_detail_state, profile_state
+)
+from .paginators import CursorPaginator
+from .timeline import TimelinePaginator
 
 
 def pagination(post_list, request):
+    if settings.CURSOR_PAGINATION or 'cursor' in request.GET:
+        paginator = CursorPaginator(post_list, settings.QUANTITY_POSTS)
+        return paginator.get_page(request.GET.get('cursor'))
     paginator = Paginator(post_list, settings.QUANTITY_POSTS)
     return paginator.get_page(request.GET.get('page'))
 
 
-@cache_page(settings.SECONDS_OF_UPDATE_CACHE, key_prefix='index_page')
+def comment_pagination(post_id, request):
+    paginator = CursorPaginator(
+        Comment.objects.filter(post_id=post_id).select_related('author'),
+        settings.QUANTITY_COMMENTS
+    )
+    return paginator.get_page(request.GET.get('cursor'))
+
+
+@cache_feed_page(
+    settings.SECONDS_OF_UPDATE_CACHE,
+    lambda request: ['index', 'groups']
+)
 def index(request):
-    post_list = Post.objects.select_related('author', 'group')
+    post_list = feed_posts(Post.objects.all())
     page_obj = pagination(post_list, request)
     context = {
         'page_obj': page_obj,
@@ -24,9 +47,14 @@ def index(request):
     return render(request, 'posts/index.html', context)
 
 
+@conditional_page(group_state)
+@cache_feed_page(
+    settings.SECONDS_OF_UPDATE_CACHE,
+    lambda request, slug: [f'group:{slug}']
+)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.select_related('author')
+    posts = feed_posts(group.posts.all())
     page_obj = pagination(posts, request)
     context = {
         'group': group,
@@ -36,37 +64,102 @@ def group_posts(request, slug):
     return render(request, 'posts/group_list.html', context)
 
 
+def profile_scopes(request, username):
+    scopes = [f'profile:{username}', f'follow:{request.user.pk}', 'groups']
+    if request.user.username == username:
+        scopes.append(recommendations.SCOPE)
+    return scopes
+
+
+@conditional_page(profile_state)
+@cache_feed_page(settings.SECONDS_OF_UPDATE_CACHE, profile_scopes)
 def profile(request, username):
-    author = User.objects.get(username=username)
-    post_list = author.posts.select_related('group')
+    author = get_object_or_404(
+        User.objects.select_related('profile'), username=username
+    )
+    author_profile = get_profile(author)
+    post_list = feed_posts(author.posts.all())
     page_obj = pagination(post_list, request)
     following = None
     if request.user.is_authenticated:
-        following = Follow.objects.filter(
-            user=request.user, author=author
-        ).exists()
+        following = graph.is_following(request.user.pk, author.pk)
+    suggestions = None
+    if request.user == author:
+        suggestions = author.recommendations.select_related(
+            'author'
+        )[:settings.RECOMMENDATIONS_PER_USER]
     context = {
         'page_obj': page_obj,
         'author': author,
+        'author_profile': author_profile,
         'profile': True,
-        'following': following
+        'following': following,
+        'recommendations': suggestions,
     }
     return render(request, 'posts/profile.html', context)
 
 
+@conditional_page(post_detail_state)
 def post_detail(request, post_id):
     post = get_object_or_404(
-        Post.objects.select_related('author', 'group'), pk=post_id
+        Post.objects.select_related('author__profile', 'group'), pk=post_id
     )
     context = {
         'post': post,
-        'post_count': post.author.posts.all(),
+        'post_count': get_profile(post.author).posts_count,
         'form': CommentForm(request.POST or None),
-        'comments': post.comments.all()
+        'comments': comment_pagination(post.id, request)
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+def post_comments(request, post_id):
+    context = {
+        'post_id': post_id,
+        'comments': comment_pagination(post_id, request)
+    }
+    return render(request, 'includes/comment_list.html', context)
+
+
+def post_search(request):
+    query = request.GET.get('q', '').strip()
+    posts, next_cursor = search.search_posts(
+        query, request.GET.get('cursor')
+    )
+    context = {
+        'query': query,
+        'posts': posts,
+        'next_cursor': next_cursor,
+    }
+    return render(request, 'posts/search.html', context)
+
+
+def export_response(queryset, request, name):
+    export_format = request.GET.get('format', 'ndjson')
+    if export_format not in export.FORMATS:
+        raise Http404('Неизвестный формат выгрузки')
+    response = StreamingHttpResponse(
+        export.iter_export(queryset, export_format),
+        content_type=export.FORMATS[export_format]
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="{name}.{export_format}"'
+    )
+    return response
+
+
+@login_required
+def export_profile(request, username):
+    author = get_object_or_404(User, username=username)
+    return export_response(author.posts.all(), request, author.username)
+
+
+@login_required
+def export_group(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    return export_response(group.posts.all(), request, group.slug)
+
+
 @login_required
 def post_create(request):
     form = PostForm(
@@ -124,9 +217,21 @@ def add_comment(request, post_id):
 
 @login_required
 def follow_index(request):
-    post_list = Post.objects.select_related('author').filter(
-        author__following__user=request.user)
-    page_obj = pagination(post_list, request)
+    celebrity_ids = feed.followed_celebrities(request.user)
+    post_list = feed_posts(feed.feed_queryset(request.user, celebrity_ids))
+    # Лента без знаменитостей целиком материализована при записи:
+    # слияние буферов нужно только для тех, чьи посты не раскладывались.
+    if (
+        settings.FEED_MERGE_ON_READ and celebrity_ids
+        and 'page' not in request.GET
+    ):
+        paginator = TimelinePaginator(
+            post_list, settings.QUANTITY_POSTS, request.user.pk,
+            settings.FEED_MERGE_MAX_AUTHORS
+        )
+        page_obj = paginator.get_page(request.GET.get('cursor'))
+    else:
+        page_obj = pagination(post_list, request)
     context = {
         'page_obj': page_obj,
     }
@@ -138,7 +243,11 @@ def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
     if request.user.username == author.username:
         return redirect('posts:profile', username=username)
-    Follow.objects.get_or_create(user=request.user, author=author)
+    try:
+        with transaction.atomic():
+            Follow.objects.create(user=request.user, author=author)
+    except IntegrityError:
+        pass
     return redirect('posts:profile', username=username)
 
 
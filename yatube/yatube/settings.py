@@ -10,7 +10,9 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/2.2/ref/settings/
 """
 
+import hashlib
 import os
+import tempfile
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -34,7 +36,49 @@ ALLOWED_HOSTS = [
 
 QUANTITY_POSTS = 10
 
-SECONDS_OF_UPDATE_CACHE = 20
+QUANTITY_COMMENTS = 20
+
+CURSOR_PAGINATION = False
+
+FEED_FANOUT_LIMIT = 5000
+
+FEED_BATCH_SIZE = 1000
+
+SECONDS_OF_UPDATE_CACHE = 60 * 60 * 6
+
+FEED_CACHE_STALE_TTL = 60 * 10
+
+FEED_CACHE_LOCK_TIMEOUT = 30
+
+FEED_CACHE_LOCK_WAIT = 0.5
+
+FEED_CACHE_BETA = 1.0
+
+CARD_CACHE_TIMEOUT = 60 * 60 * 24
+
+EXPORT_BATCH_SIZE = 500
+
+IMPORT_BATCH_SIZE = 5000
+
+# Страницы лент из PostCard со слотами вместо моделей Post.
+FEED_CARD_RECORDS = False
+
+# Лента подписок слиянием кэшированных последних постов авторов
+# для читателей знаменитостей (их посты не раскладываются при записи).
+FEED_MERGE_ON_READ = True
+
+FEED_RECENT_POSTS = 100
+
+FEED_RECENT_TIMEOUT = 60 * 60 * 24
+
+# Больше подписок — лента из материализованных записей через JOIN.
+FEED_MERGE_MAX_AUTHORS = 2000
+
+# Сколько пользователей держит в памяти граф подписок каждой стороны.
+GRAPH_MAX_USERS = 50000
+
+# Сколько авторов рекомендовать каждому в блоке «Кого почитать».
+RECOMMENDATIONS_PER_USER = 10
 
 # Application definition
 
@@ -53,6 +97,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.QueryInspectMiddleware',
+    'core.middleware.ReplicaStickinessMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -91,11 +137,33 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'core.db.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'timeout': 20,
+            'transaction_mode': 'IMMEDIATE',
+        },
     }
 }
 
+# Реплики только для чтения: пути к копиям базы через запятую.
+# Для SQLite их обновляет команда sync_replicas.
+for number, path in enumerate(
+    filter(None, os.getenv('YATUBE_REPLICAS', '').split(',')), 1
+):
+    DATABASES[f'replica{number}'] = dict(
+        DATABASES['default'], NAME=path, TEST={'MIRROR': 'default'}
+    )
+
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+# Модели, которые можно читать из реплик; сессии, пользователи и записи
+# sorl всегда читаются из основной базы.
+DATABASE_REPLICA_APPS = ['posts']
+DATABASE_ROUTERS = ['core.routers.PrimaryReplicaRouter']
+REPLICA_STICKY_SECONDS = 15
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -148,8 +216,62 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+THUMBNAIL_WORKERS = 2
+
+# Загруженные картинки уменьшаются до IMAGE_MAX_SIDE по длинной стороне
+# и пережимаются в IMAGE_FORMAT (JPEG или WEBP) с качеством IMAGE_QUALITY.
+IMAGE_MAX_SIDE = 2048
+
+IMAGE_FORMAT = 'JPEG'
+
+IMAGE_QUALITY = 82
+
+# Общий кэш процессов: файл SQLite в разделяемой памяти (/dev/shm),
+# если она есть. Каталог свой у каждой копии проекта (по BASE_DIR)
+# и пользователя; SharedCache создаёт его с правами 0700 и откажется
+# работать с чужим каталогом или файлом: в кэше лежат pickle.
+# Тесты берут свой кэш из yatube.settings_test.
+SHARED_CACHE_DIR = os.path.join(
+    '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir(),
+    'yatube-{}-{}'.format(
+        os.getuid(), hashlib.sha256(BASE_DIR.encode()).hexdigest()[:12]
+    )
+)
+
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.cache.SharedCache',
+        'LOCATION': os.path.join(SHARED_CACHE_DIR, 'cache.sqlite3'),
+        'KEY_PREFIX': 'yatube',
+        'OPTIONS': {
+            'MAX_BYTES': 128 * 1024 * 1024,
+            'MAX_ENTRIES': 200000,
+        },
     }
 }
+
+SQL_INSPECT_SAMPLE_RATE = 1.0 if DEBUG else 0.01
+SQL_INSPECT_REPEAT_THRESHOLD = 5
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'filters': {
+        'require_debug_true': {
+            '()': 'django.utils.log.RequireDebugTrue',
+        },
+    },
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+            'filters': ['require_debug_true'],
+        },
+    },
+    'loggers': {
+        'yatube.sql': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
@@ -0,0 +1,22 @@
+"""Настройки для тестов: общий кэш во временном каталоге прогона.
+
+Тесты работают с тем же SharedCache, что и сервер, но не видят
+страниц, закэшированных им или прошлым прогоном.
+"""
+import atexit
+import os
+import shutil
+import tempfile
+
+from .settings import *  # noqa: F401,F403
+from .settings import CACHES
+
+TEST_CACHE_DIR = tempfile.mkdtemp(prefix='yatube-test-cache-')
+atexit.register(shutil.rmtree, TEST_CACHE_DIR, ignore_errors=True)
+
+CACHES = {
+    'default': dict(
+        CACHES['default'],
+        LOCATION=os.path.join(TEST_CACHE_DIR, 'cache.sqlite3'),
+    ),
+}